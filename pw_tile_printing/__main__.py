@@ -1,5 +1,7 @@
 import argparse
 import sys
+import tempfile
+from pathlib import Path
 
 OPEN_UI = not bool(sys.argv[1:])
 
@@ -9,16 +11,94 @@ if __name__ == '__main__':
         main.show()
     else:
         parser = argparse.ArgumentParser()
-        parser.add_argument('-im', '--image')
-        parser.add_argument('-wd', '--image_width')
-        parser.add_argument('-hg', '--image_height')
-        parser.add_argument('-ka', '--keep_aspect_ratio')
-        parser.add_argument('-pg', '--pages', nargs='+', required=False)
+        parser.add_argument('-im', '--image', required=True)
+        parser.add_argument('-wd', '--image_width', type=float, help='mm')
+        parser.add_argument('-hg', '--image_height', type=float, help='mm')
+        parser.add_argument('-ka', '--keep_aspect_ratio', type=int, default=1)
+        parser.add_argument('-pg', '--pages', nargs='+', required=False,
+                            help='zero based pages to render: 3 2-5 r1 c2 r1c2')
         parser.add_argument('-op', '--output_path')
-        parser.add_argument('-pr', '--print')
+        parser.add_argument('-pr', '--print', action='store_true')
         parser.add_argument('-pn', '--printer_name')
-        parser.add_argument('-pd', '--page_padding')
-        parser.add_argument('-ox', '--offset_x')
-        parser.add_argument('-oy', '--offset_y')
-
+        parser.add_argument('-pd', '--page_padding', type=float, nargs=4, default=(0, 0, 0, 0),
+                            help='left top right bottom (mm)')
+        parser.add_argument('-ox', '--offset_x', type=float, default=0)
+        parser.add_argument('-oy', '--offset_y', type=float, default=0)
+        parser.add_argument('-dp', '--dpi', type=int, default=300)
+        parser.add_argument('-ps', '--paper', default='A4', help='media name from catalog, e.g. A4, Roll 914mm')
+        parser.add_argument('-or', '--orientation', choices=['portrait', 'landscape'], default='portrait')
+        parser.add_argument('-mm', '--printer_margins', action='store_true',
+                            help='use hardware margins of printer_name as padding')
+        parser.add_argument('-ol', '--overlap', type=float, default=0, help='neighbour pages overlap (mm)')
+        parser.add_argument('-rm', '--registration_marks', action='store_true')
+        parser.add_argument('-pl', '--page_labels', action='store_true')
+        parser.add_argument('-br', '--band_rows', type=int, help='render pages in bands of N pixel rows')
+        parser.add_argument('-st', '--strategy', choices=['full', 'page', 'band'],
+                            help='render strategy, chosen by memory budget by default')
+        parser.add_argument('-mb', '--memory_budget', type=int, help='peak memory limit (MB)')
+        parser.add_argument('-cp', '--output_profile', help='printer ICC profile path or sRGB')
+        parser.add_argument('-ri', '--rendering_intent', default='perceptual',
+                            choices=['perceptual', 'relative', 'saturation', 'absolute'])
+        opt = parser.parse_args()
 
+        from pw_tile_printing.tiler import Tiler, ORIENT_PORTRAIT, ORIENT_LANDSCAPE
+        from pw_tile_printing.media import MediaCatalog
+        media = MediaCatalog().get(opt.paper)
+        padding = opt.page_padding
+        if opt.printer_margins:
+            from pw_tile_printing.print_manager import get_printer_margins
+            padding = get_printer_margins(opt.printer_name, media.name) or padding
+        tiler = Tiler(Path(opt.image))
+        width, height = opt.image_width, opt.image_height
+        if not width and not height:
+            width, height = tiler.image_size_mm
+        elif not height:
+            height = width * tiler.image.height / tiler.image.width
+        elif not width:
+            width = height * tiler.image.width / tiler.image.height
+        layout = dict(
+            padding=padding,
+            page_size=media.size,
+            page_orient=ORIENT_LANDSCAPE if opt.orientation == 'landscape' else ORIENT_PORTRAIT,
+            keep_aspect_ratio=bool(opt.keep_aspect_ratio),
+            dpi=opt.dpi,
+            offset=(opt.offset_x, opt.offset_y),
+            overlap=opt.overlap,
+        )
+        if opt.print and not opt.output_path and (opt.band_rows or opt.strategy == 'band' or media.is_roll):
+            # banded pages go straight to printer spool without page files
+            from pw_tile_printing.tiler import select_pages
+            from pw_tile_printing.print_manager import stream_pages
+            plan = tiler.plan_tiles((width, height), **layout)
+            jobs = stream_pages(
+                tiler, plan, opt.printer_name,
+                pages=select_pages(plan, opt.pages) if opt.pages else None,
+                band_rows=opt.band_rows,
+                output_profile=opt.output_profile,
+                rendering_intent=opt.rendering_intent,
+                registration_marks=opt.registration_marks,
+                page_labels=opt.page_labels,
+            )
+            for job_id in jobs:
+                print(job_id)
+        else:
+            output_path = opt.output_path or Path(tempfile.mkdtemp(), 'tile-page.png').as_posix()
+            tiles = tiler.make_tiles(
+                (width, height),
+                save_path=Path(output_path),
+                pages=opt.pages,
+                registration_marks=opt.registration_marks,
+                page_labels=opt.page_labels,
+                band_rows=opt.band_rows,
+                output_profile=opt.output_profile,
+                rendering_intent=opt.rendering_intent,
+                strategy=opt.strategy,
+                memory_budget=opt.memory_budget and opt.memory_budget * 2**20,
+                **layout
+            )
+            for page in tiles['pages']:
+                print(page['image'])
+            if opt.print:
+                from pw_tile_printing.print_manager import print_image
+                for page in tiles['pages']:
+                    print_image(page['image'], opt.printer_name)
@@ -0,0 +1,118 @@
+"""
+Memory budget governor: estimate peak memory of render strategies and pick one that fits.
+
+Strategies:
+    full    resize whole image once, crop pages. Fastest, biggest
+    page    resample source region of each row of pages
+    band    stream each page in bands of rows, constant memory (needs save path)
+"""
+import os
+
+STRATEGY_FULL = 'full'
+STRATEGY_PAGE = 'page'
+STRATEGY_BAND = 'band'
+STRATEGIES = (STRATEGY_FULL, STRATEGY_PAGE, STRATEGY_BAND)
+MIN_BAND_ROWS = 16
+DEFAULT_BAND_ROWS = 512
+
+
+def pixel_bytes(mode: str) -> int:
+    """
+    Bytes per pixel of Pillow image in memory. RGB is stored with 4 bytes per pixel
+    """
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def default_memory_budget() -> int:
+    """
+    Half of physical memory, 2 GB if unknown
+    """
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (ValueError, OSError, AttributeError):
+        return 2 * 1024 ** 3
+
+
+def estimate_memory(plan: dict, source_size: tuple, source_mode: str, strategy: str,
+                    band_rows: int = DEFAULT_BAND_ROWS) -> int:
+    """
+    Estimated peak memory of one render process (bytes)
+
+    :param plan: layout from Tiler.plan_tiles
+    :param source_size: source image size (pixels)
+    :param source_mode: source image mode
+    :param strategy: full, page or band
+    :param band_rows: band height for band strategy (pixels)
+    """
+    from .tiler import mm_to_px
+    dpi = plan['dpi']
+    bpp = pixel_bytes(source_mode)
+    source = source_size[0] * source_size[1] * bpp
+    full_w, full_h = mm_to_px(plan['image_size'][0], dpi), mm_to_px(plan['image_size'][1], dpi)
+    page_w, page_h = mm_to_px(plan['page_size'][0], dpi), mm_to_px(plan['page_size'][1], dpi)
+    content_h = max((mm_to_px(tile['rect'].h, dpi) for tile in plan['rects']), default=0)
+    # page image, resampled content crop, marks mask
+    page = page_w * page_h * (4 + bpp + 1)
+    if strategy == STRATEGY_FULL:
+        return source + full_w * full_h * bpp + page
+    if strategy == STRATEGY_PAGE:
+        # row band and its overlap strip reused by the next row
+        return source + full_w * content_h * bpp * 2 + page
+    if strategy == STRATEGY_BAND:
+        return source + page_w * band_rows * (4 + bpp + 1) + full_w * band_rows * bpp
+    raise ValueError(f'Unknown strategy: {strategy}')
+
+
+def plan_render(plan: dict, source_size: tuple, source_mode: str,
+                budget: int = None,
+                pages: list = None,
+                max_workers: int = 1,
+                can_band: bool = True,
+                band_rows: int = DEFAULT_BAND_ROWS) -> dict:
+    """
+    Pick the fastest strategy that fits memory budget and worker count for it
+
+    :param plan: layout from Tiler.plan_tiles
+    :param source_size: source image size (pixels)
+    :param source_mode: source image mode
+    :param budget: memory budget (bytes), half of physical memory if None
+    :param pages: page indexes to render, all pages if None
+    :param max_workers: upper limit of parallel render processes
+    :param can_band: band strategy is possible (output is saved to files)
+    :param band_rows: preferred band height (pixels)
+    :return: dict(strategy, workers, band_rows, peak, budget, fits, estimates)
+    """
+    budget = budget or default_memory_budget()
+    page_count = len(plan['rects']) if pages is None else len(pages)
+    all_pages = pages is None or len(set(pages)) == len(plan['rects'])
+    estimates = {strategy: estimate_memory(plan, source_size, source_mode, strategy, band_rows)
+                 for strategy in STRATEGIES}
+    if plan.get('roll') and can_band:
+        candidates = [STRATEGY_BAND]
+    else:
+        candidates = ([STRATEGY_FULL] if all_pages else []) + [STRATEGY_PAGE] + ([STRATEGY_BAND] if can_band else [])
+    strategy = next((s for s in candidates if estimates[s] <= budget), None)
+    if strategy is None and can_band:
+        # shrink bands until they fit
+        strategy = STRATEGY_BAND
+        while band_rows > MIN_BAND_ROWS and estimates[STRATEGY_BAND] > budget:
+            band_rows //= 2
+            estimates[STRATEGY_BAND] = estimate_memory(plan, source_size, source_mode, STRATEGY_BAND, band_rows)
+    strategy = strategy or candidates[-1]
+    peak = estimates[strategy]
+    # several workers render page ranges, so each of them works as page or band strategy
+    worker_peak = peak if strategy == STRATEGY_BAND else estimates[STRATEGY_PAGE]
+    workers = max(1, min(max_workers, page_count, budget // max(1, worker_peak)))
+    return dict(
+        strategy=strategy,
+        workers=workers,
+        band_rows=band_rows,
+        peak=peak,
+        budget=budget,
+        fits=peak <= budget,
+        estimates=estimates,
+    )
@@ -0,0 +1,86 @@
+"""
+Color management of rendered tiles with Pillow ImageCms.
+
+Transforms are built once per (source profile, output profile, intent)
+and cached for all pages and jobs of the process.
+"""
+import io
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageCms
+
+SRGB = 'sRGB'
+INTENTS = {
+    'perceptual': ImageCms.Intent.PERCEPTUAL,
+    'relative': ImageCms.Intent.RELATIVE_COLORIMETRIC,
+    'saturation': ImageCms.Intent.SATURATION,
+    'absolute': ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+}
+COLOR_SPACE_MODES = {'RGB': 'RGB', 'GRAY': 'L', 'CMYK': 'CMYK'}
+
+
+class ColorTransform:
+    """
+    Cached ImageCms transform from source profile to RGB output profile
+
+    :param transform: ImageCms transform, None if source and output profiles are the same
+    :param in_mode: image mode of source profile color space
+    :param output_profile: output profile bytes to embed into saved pages
+    """
+    def __init__(self, transform, in_mode: str, output_profile: bytes):
+        self.transform = transform
+        self.in_mode = in_mode
+        self.output_profile = output_profile
+
+    def apply(self, img: Image.Image) -> Image.Image:
+        """
+        Convert tile colors to RGB, RGB tile is changed in place if it already has mode of source profile
+        """
+        if img.mode != self.in_mode:
+            img = img.convert(self.in_mode)
+        if self.transform is None:
+            return img
+        if self.in_mode != 'RGB':
+            # in place transform needs the same input and output modes
+            return ImageCms.applyTransform(img, self.transform)
+        ImageCms.applyTransform(img, self.transform, inPlace=True)
+        return img
+
+
+def load_profile(profile) -> ImageCms.ImageCmsProfile:
+    """
+    :param profile: 'sRGB', path to ICC file or profile bytes
+    """
+    if isinstance(profile, bytes):
+        return ImageCms.ImageCmsProfile(io.BytesIO(profile))
+    if profile == SRGB:
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile(SRGB))
+    return ImageCms.ImageCmsProfile(Path(profile).as_posix())
+
+
+@lru_cache(maxsize=32)
+def get_color_transform(source_profile: bytes = None,
+                        output_profile: str = SRGB,
+                        intent: str = 'perceptual') -> ColorTransform:
+    """
+    Cached transform
+
+    :param source_profile: embedded ICC profile of source image, sRGB if None
+    :param output_profile: 'sRGB' or path to printer/output ICC file
+    :param intent: perceptual, relative, saturation or absolute
+    """
+    if intent not in INTENTS:
+        raise ValueError(f'Unknown rendering intent: {intent}')
+    src = load_profile(source_profile or SRGB)
+    dst = load_profile(output_profile)
+    in_mode = COLOR_SPACE_MODES.get(src.profile.xcolor_space.strip())
+    if not in_mode:
+        raise ValueError(f'Unsupported source color space: {src.profile.xcolor_space}')
+    if dst.profile.xcolor_space.strip() != 'RGB':
+        raise ValueError(f'Output profile must be RGB: {output_profile}')
+    if src.tobytes() == dst.tobytes():
+        # same profile, nothing to convert
+        return ColorTransform(None, in_mode, dst.tobytes())
+    transform = ImageCms.buildTransform(src, dst, in_mode, 'RGB', renderingIntent=INTENTS[intent])
+    return ColorTransform(transform, in_mode, dst.tobytes())
@@ -0,0 +1,393 @@
+"""
+Watch folder daemon: tile and print images dropped into hot folders.
+
+    python -m pw_tile_printing.daemon config.json
+
+Config example:
+
+    {
+        "workers": 2,
+        "print_concurrency": 1,
+        "settle_time": 5,
+        "poll_interval": 2,
+        "memory_budget": 4096,
+        "folders": [
+            {
+                "path": "/srv/hot/poster_a4",
+                "output": "/srv/tiles/poster_a4",
+                "preset": {
+                    "image_size": [1000, 700],
+                    "paper": "A4",
+                    "orientation": "portrait",
+                    "padding": [5, 5, 5, 5],
+                    "dpi": 300,
+                    "printer": "Office_Printer"
+                }
+            }
+        ]
+    }
+
+Preset accepts Tiler.make_tiles options, plus paper (media name), orientation,
+source_dpi, printer and printer_margins (use printer hardware margins as padding).
+memory_budget (MB) is shared by render workers, each job picks render strategy to fit its part.
+Processed images are moved to "done" or "failed" subfolder of watched folder.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import logging
+import os
+import select
+import shutil
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+
+logger = logging.getLogger('pw_tile_printing.daemon')
+
+
+class PollingWatcher:
+    """
+    Report image files of folders every poll interval
+    """
+    def __init__(self, folders: list):
+        self.folders = [Path(folder) for folder in folders]
+
+    def poll(self, timeout: float) -> list:
+        time.sleep(timeout)
+        return self.scan()
+
+    def scan(self) -> list:
+        files = []
+        for folder in self.folders:
+            files.extend(path for path in folder.iterdir()
+                         if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS)
+        return files
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(PollingWatcher):
+    """
+    Report files closed after writing or moved into folders (Linux inotify)
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, folders: list):
+        super().__init__(folders)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        for folder in self.folders:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed: {folder}')
+            self.watches[wd] = folder
+
+    def poll(self, timeout: float) -> list:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        files = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, pos)
+            pos += self.EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if mask & self.IN_Q_OVERFLOW:
+                # events are lost, look at all files
+                logger.warning('inotify event queue overflow, scanning folders')
+                return self.scan()
+            if wd not in self.watches:
+                continue
+            path = self.watches[wd] / os.fsdecode(name)
+            if name and path.suffix.lower() in IMAGE_EXTENSIONS:
+                files.append(path)
+        return files
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(folders: list, polling: bool = False) -> PollingWatcher:
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError) as e:
+            logger.warning('inotify is not available, polling folders: %s', e)
+    return PollingWatcher(folders)
+
+
+class PendingFiles:
+    """
+    Files waiting until writing is finished: size and mtime are not changed during settle time.
+    Submitted files are remembered until they are moved out of folder,
+    so the same file version is never processed twice.
+    """
+    def __init__(self, settle_time: float):
+        self.settle_time = settle_time
+        self.pending = {}
+        self.submitted = {}
+
+    def touch(self, path: Path):
+        stamp = file_stamp(path)
+        if stamp is None or self.submitted.get(path) == stamp:
+            return
+        if path not in self.pending or self.pending[path][0] != stamp:
+            self.pending[path] = (stamp, time.monotonic())
+
+    def ready(self) -> list:
+        now = time.monotonic()
+        ready = []
+        for path, (stamp, since) in list(self.pending.items()):
+            current = file_stamp(path)
+            if current is None:
+                del self.pending[path]
+            elif current != stamp:
+                self.pending[path] = (current, now)
+            elif now - since >= self.settle_time:
+                ready.append(path)
+        return ready
+
+    def submit(self, path: Path):
+        stamp, since = self.pending.pop(path)
+        self.submitted[path] = stamp
+
+    def forget(self, path: Path):
+        """
+        File is moved out of folder, it can not come back with the same stamp
+        """
+        self.submitted.pop(path, None)
+
+
+def file_stamp(path: Path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def job_dir_name(path: Path) -> str:
+    """
+    Output directory of image file version: images with the same stem, from other folders
+    or other versions of the same file never share pages and job manifest
+    """
+    key = f'{path.resolve()}:{file_stamp(path)}'
+    return f"{path.stem}_{path.suffix.lstrip('.').lower()}_{hashlib.sha1(key.encode()).hexdigest()[:8]}"
+
+
+def render_job(path: str, output: str, preset: dict) -> list:
+    """
+    Tile one image with folder preset, runs in worker process
+
+    :return: saved page files
+    """
+    from .tiler import Tiler, ORIENT_PORTRAIT, ORIENT_LANDSCAPE
+    from .media import MediaCatalog
+    preset = dict(preset)
+    printer = preset.pop('printer', None)
+    media = MediaCatalog().get(preset.pop('paper', 'A4'))
+    orient = ORIENT_LANDSCAPE if preset.pop('orientation', 'portrait') == 'landscape' else ORIENT_PORTRAIT
+    if preset.pop('printer_margins', False) and printer:
+        from .print_manager import get_printer_margins
+        preset['padding'] = get_printer_margins(printer, media.name) or preset.get('padding', (0, 0, 0, 0))
+    tiler = Tiler(Path(path), dpi=preset.pop('source_dpi', None))
+    image_size = preset.pop('image_size', None) or tiler.image_size_mm
+    tiles = tiler.make_tiles(image_size,
+                             page_size=media.size,
+                             page_orient=orient,
+                             save_path=Path(output, job_dir_name(Path(path)), 'page_####.png'),
+                             **preset)
+    return [page['image'] for page in tiles['pages']]
+
+
+class WatchDaemon:
+    """
+    Watch folders, render new images with bounded process pool and send pages to printer
+
+    :param folders: list of dict(path, output, preset)
+    :param workers: render processes
+    :param max_jobs: rendering and queued jobs limit, new files wait in folder
+    :param print_concurrency: parallel print submissions
+    :param settle_time: seconds file must stay unchanged before processing
+    :param poll_interval: seconds between checks
+    :param polling: do not use inotify
+    :param memory_budget: peak memory limit of all render workers (bytes), see budget.plan_render
+    :param broken_retries: how many times job is rendered again after a render worker died (e.g. OOM killed).
+        All jobs of the pool fail when one worker dies, so they are rendered again, each in its own process,
+        to tell apart the job that killed it
+    """
+    def __init__(self, folders: list, workers: int = 2, max_jobs: int = None, print_concurrency: int = 1,
+                 settle_time: float = 5, poll_interval: float = 2, polling: bool = False,
+                 memory_budget: int = None, broken_retries: int = 1):
+        self.folders = {Path(folder['path']).resolve(): folder for folder in folders}
+        if memory_budget:
+            for folder in self.folders.values():
+                folder['preset'].setdefault('memory_budget', memory_budget // workers)
+        for path in self.folders:
+            for sub in (DONE_DIR, FAILED_DIR):
+                (path / sub).mkdir(parents=True, exist_ok=True)
+        self.max_jobs = max_jobs or workers * 2
+        self.poll_interval = poll_interval
+        self.pending = PendingFiles(settle_time)
+        self.watcher = create_watcher(list(self.folders), polling=polling)
+        self.workers = workers
+        self.broken_retries = broken_retries
+        self.render_pool = ProcessPoolExecutor(max_workers=workers)
+        self.print_pool = ThreadPoolExecutor(max_workers=print_concurrency)
+        # path: (future, pool, attempt)
+        self.jobs = {}
+        self.running = False
+
+    def run(self):
+        self.running = True
+        for path in self.watcher.scan():
+            self.pending.touch(path)
+        logger.info('Watching %s', ', '.join(map(str, self.folders)))
+        try:
+            while self.running:
+                for path in self.watcher.poll(self.poll_interval):
+                    self.pending.touch(path)
+                self.collect_finished()
+                for path in self.pending.ready():
+                    if len(self.jobs) >= self.max_jobs:
+                        break
+                    self.submit(path)
+        finally:
+            self.shutdown()
+
+    def stop(self, *args):
+        self.running = False
+
+    def submit(self, path: Path):
+        self.pending.submit(path)
+        logger.info('Render %s', path)
+        self.start_job(path)
+
+    def start_job(self, path: Path, attempt: int = 0):
+        folder = self.folders[path.parent.resolve()]
+        args = (render_job, path.as_posix(), folder['output'], folder['preset'])
+        # retry after a worker died runs alone, its crash does not break other jobs
+        pool = ProcessPoolExecutor(max_workers=1) if attempt else self.render_pool
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            self.restart_pool()
+            pool = self.render_pool
+            future = pool.submit(*args)
+        self.jobs[path] = (future, pool, attempt)
+
+    def restart_pool(self):
+        logger.warning('Render worker died, restarting render pool')
+        self.render_pool.shutdown(wait=False, cancel_futures=True)
+        self.render_pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def collect_finished(self):
+        for path, (future, pool, attempt) in list(self.jobs.items()):
+            if not future.done():
+                continue
+            del self.jobs[path]
+            if pool is not self.render_pool:
+                pool.shutdown(wait=False)
+            folder = self.folders[path.parent.resolve()]
+            try:
+                pages = future.result()
+            except BrokenProcessPool:
+                if not self.running:
+                    # left in folder, rendered on next start
+                    logger.warning('Not rendered %s: render worker died on shutdown', path)
+                    continue
+                if pool is self.render_pool:
+                    self.restart_pool()
+                if attempt < self.broken_retries:
+                    logger.warning('Render worker died, render again %s', path)
+                    self.start_job(path, attempt + 1)
+                    continue
+                logger.error('Failed %s: render worker died', path)
+                if self.move(path, FAILED_DIR):
+                    self.pending.forget(path)
+                continue
+            except Exception as e:
+                logger.error('Failed %s: %s', path, e)
+                if self.move(path, FAILED_DIR):
+                    self.pending.forget(path)
+                continue
+            logger.info('Rendered %s: %d pages', path, len(pages))
+            printer = folder['preset'].get('printer')
+            if printer:
+                self.print_pool.submit(self.print_pages, pages, printer)
+            if self.move(path, DONE_DIR):
+                self.pending.forget(path)
+
+    @staticmethod
+    def print_pages(pages: list, printer: str):
+        from .print_manager import print_image
+        for page in pages:
+            try:
+                print_image(page, printer)
+            except Exception as e:
+                logger.error('Print failed %s: %s', page, e)
+
+    @staticmethod
+    def move(path: Path, sub: str) -> bool:
+        target = path.parent / sub / path.name
+        if target.exists():
+            target = target.with_name(f'{path.stem}_{int(time.time())}{path.suffix}')
+        try:
+            shutil.move(path.as_posix(), target.as_posix())
+        except OSError as e:
+            logger.error('Can not move %s: %s', path, e)
+            return False
+        return True
+
+    def shutdown(self):
+        self.watcher.close()
+        self.render_pool.shutdown(wait=True)
+        for future, pool, attempt in list(self.jobs.values()):
+            # retries run in their own pools
+            pool.shutdown(wait=True)
+        self.collect_finished()
+        self.print_pool.shutdown(wait=True)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='pw_tile_printing.daemon')
+    parser.add_argument('config', help='json config file')
+    parser.add_argument('--polling', action='store_true', help='poll folders instead of inotify')
+    opt = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    config = json.loads(Path(opt.config).read_text())
+    daemon = WatchDaemon(config['folders'],
+                         workers=config.get('workers', 2),
+                         max_jobs=config.get('max_jobs'),
+                         print_concurrency=config.get('print_concurrency', 1),
+                         settle_time=config.get('settle_time', 5),
+                         poll_interval=config.get('poll_interval', 2),
+                         polling=opt.polling,
+                         memory_budget=config.get('memory_budget') and config['memory_budget'] * 2**20)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Coordinator/worker rendering of one tiles job on several processes or machines.
+
+Coordinator computes layout once and hands out page ranges over local socket,
+workers render ranges with Tiler and report results back.
+Output directory must be shared between coordinator and all workers.
+
+Coordinator uses random auth key unless authkey is given. For remote workers pass
+the same key to coordinator and to each worker:
+
+    PW_TILE_AUTHKEY=secret python -m pw_tile_printing.distributed coordinator poster.png /shared/out/page_####.png \
+        -wd 1000 --bind 0.0.0.0:6000 --workers 2
+    PW_TILE_AUTHKEY=secret python -m pw_tile_printing.distributed worker coordinator-host:6000
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import traceback
+from collections import deque
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+
+from .tiler import Tiler, select_pages
+from .budget import plan_render
+
+# Tiler.render_pages options, the rest of options describe layout
+RENDER_OPTIONS = ('border_cut_line', 'border_cut_line_height', 'overlap_marks', 'registration_marks', 'page_labels',
+                  'resume', 'band_rows', 'output_profile', 'rendering_intent', 'strategy', 'memory_budget')
+
+
+def split_ranges(pages, chunk_size: int) -> list:
+    """
+    Split page indexes to ranges of chunk_size pages
+    """
+    pages = list(pages)
+    return [pages[i:i+chunk_size] for i in range(0, len(pages), max(1, chunk_size))]
+
+
+class Coordinator:
+    """
+    Serve page ranges of one job to connected workers
+
+    :param image: source image path, must be readable by workers
+    :param save_path: output files pattern, directory must be shared with workers
+    :param source_dpi: source image dpi
+    :param chunk_size: pages per task
+    :param retries: how many times failed range is given out again
+    :param address: listen address, random free port by default
+    :param authkey: connection auth key, random if None
+    :param options: layout and render options of Tiler.make_tiles
+    """
+    def __init__(self, image: Path, save_path: Path, source_dpi: int = None, chunk_size: int = 4,
+                 retries: int = 1, address: tuple = ('127.0.0.1', 0), authkey: bytes = None,
+                 **options):
+        self.image = Path(image)
+        self.save_path = Path(save_path)
+        self.source_dpi = source_dpi
+        self.retries = retries
+        self.authkey = authkey or os.urandom(32)
+        self.render_options = {key: options.pop(key) for key in RENDER_OPTIONS if key in options}
+        pages = options.pop('pages', None)
+        tiler = Tiler(self.image, dpi=source_dpi)
+        self.source_size, self.source_mode = tiler.image.size, tiler.image.mode
+        self.plan = tiler.plan_tiles(**options)
+        if pages is None:
+            pages = range(len(self.plan['rects']))
+        else:
+            pages = select_pages(self.plan, pages)
+        self.queue = deque(dict(id=i, pages=pages, attempt=0)
+                           for i, pages in enumerate(split_ranges(pages, chunk_size)))
+        self.total = len(self.queue)
+        self.pages = {}
+        self.errors = []
+        self._finished = 0
+        self._connected = 0
+        self._seen_worker = False
+        self._lock = threading.Condition()
+        self._done = threading.Event()
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        if not self.total:
+            self._done.set()
+
+    def serve(self, processes: list = None, poll_interval: float = 1) -> dict:
+        """
+        Accept workers until all ranges are rendered.
+        Fails remaining ranges when all workers are gone: local processes are dead
+        and no worker is connected.
+
+        :param processes: local worker processes
+        :param poll_interval: seconds between worker checks
+        :return: dict as Tiler.make_tiles
+        """
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        processes = processes or []
+        while not self._done.wait(poll_interval):
+            if any(proc.is_alive() for proc in processes):
+                continue
+            with self._lock:
+                if self._connected or not (processes or self._seen_worker) or self._done.is_set():
+                    continue
+                codes = ', '.join(str(proc.exitcode) for proc in processes)
+                while self.queue:
+                    task = self.queue.popleft()
+                    self.errors.append(f"pages {task['pages']}: no workers left" +
+                                       (f' (exit codes: {codes})' if codes else ''))
+                self._done.set()
+                self._lock.notify_all()
+        self.listener.close()
+        if self.errors:
+            raise RuntimeError('Failed page ranges:\n' + '\n'.join(self.errors))
+        return dict(
+            rows=self.plan['rows'],
+            columns=self.plan['columns'],
+            pages=[self.pages[num] for num in sorted(self.pages)]
+        )
+
+    def _accept_loop(self):
+        while not self._done.is_set():
+            try:
+                conn = self.listener.accept()
+            except multiprocessing.AuthenticationError:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._handle_worker, args=(conn,), daemon=True).start()
+
+    def _next_task(self):
+        # wait while other workers have ranges in progress, failed ones come back to queue
+        with self._lock:
+            self._lock.wait_for(lambda: self.queue or self._done.is_set())
+            return self.queue.popleft() if self.queue else None
+
+    def _finish_task(self, task, result=None, error=None):
+        with self._lock:
+            if error is not None:
+                if task['attempt'] < self.retries:
+                    task['attempt'] += 1
+                    self.queue.append(task)
+                    self._lock.notify_all()
+                    return
+                self.errors.append(f"pages {task['pages']}: {error}")
+            else:
+                for page in result['pages']:
+                    self.pages[page['page']] = page
+            self._finished += 1
+            if self._finished == self.total:
+                self._done.set()
+                self._lock.notify_all()
+
+    def _handle_worker(self, conn):
+        task = None
+        with self._lock:
+            self._connected += 1
+            self._seen_worker = True
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == 'done':
+                    self._finish_task(task, result=msg[1])
+                elif msg[0] == 'error':
+                    self._finish_task(task, error=msg[1])
+                task = self._next_task()
+                if task is None:
+                    conn.send(('stop',))
+                    break
+                conn.send(('task', dict(
+                    image=self.image.as_posix(),
+                    source_dpi=self.source_dpi,
+                    plan=self.plan,
+                    pages=task['pages'],
+                    save_path=self.save_path.as_posix(),
+                    render_options=self.render_options,
+                )))
+        except (EOFError, OSError):
+            # worker is gone, give its range to another one
+            if task is not None:
+                self._finish_task(task, error='worker disconnected')
+        finally:
+            conn.close()
+            with self._lock:
+                self._connected -= 1
+
+
+def run_worker(address: tuple, authkey: bytes):
+    """
+    Render page ranges from coordinator until it has no more work
+    """
+    tilers = {}
+    with Client(tuple(address), authkey=authkey) as conn:
+        conn.send(('ready',))
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                # coordinator finished the job without waiting for this worker
+                break
+            if msg[0] == 'stop':
+                break
+            task = msg[1]
+            try:
+                key = (task['image'], task['source_dpi'])
+                if key not in tilers:
+                    tilers[key] = Tiler(Path(task['image']), dpi=task['source_dpi'])
+                result = tilers[key].render_pages(
+                    task['plan'],
+                    pages=task['pages'],
+                    save_path=Path(task['save_path']),
+                    **task['render_options']
+                )
+                conn.send(('done', result))
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+
+
+def render_distributed(image: Path, save_path: Path, workers: int = None, **options) -> dict:
+    """
+    Render job with coordinator and local worker processes
+
+    :param image: source image path
+    :param save_path: output files pattern
+    :param workers: local worker processes count. By default as many as fit memory budget, up to cpu count.
+        With 0 only remote workers are served
+    :param options: Coordinator (address, authkey, chunk_size...) and Tiler.make_tiles options.
+        Listen address is printed, so remote workers can join
+    :return: dict as Tiler.make_tiles
+    """
+    coordinator = Coordinator(image, save_path, **options)
+    print('Coordinator listening on {}:{}'.format(*coordinator.address))
+    if workers is None:
+        render_plan = plan_render(coordinator.plan, coordinator.source_size, coordinator.source_mode,
+                                  budget=options.get('memory_budget'),
+                                  max_workers=min(os.cpu_count() or 1, coordinator.total))
+        workers = render_plan['workers']
+        if workers > 1 or options.get('memory_budget'):
+            # budget is shared by local workers
+            coordinator.render_options['memory_budget'] = render_plan['budget'] // workers
+    processes = [multiprocessing.Process(target=run_worker, args=(coordinator.address, coordinator.authkey),
+                                         daemon=True)
+                 for _ in range(workers)]
+    for proc in processes:
+        proc.start()
+    try:
+        return coordinator.serve(processes)
+    finally:
+        for proc in processes:
+            proc.join(timeout=5)
+
+
+def parse_address(address: str) -> tuple:
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='pw_tile_printing.distributed')
+    sub = parser.add_subparsers(dest='mode', required=True)
+    worker = sub.add_parser('worker', help='connect to coordinator and render page ranges')
+    worker.add_argument('address', help='coordinator address host:port')
+    coordinator = sub.add_parser('coordinator', help='serve page ranges of one job to workers')
+    coordinator.add_argument('image', help='source image, same path must be readable by workers')
+    coordinator.add_argument('output', help='output files pattern, directory must be shared with workers')
+    coordinator.add_argument('-b', '--bind', default='127.0.0.1:0', help='listen address host:port')
+    coordinator.add_argument('-w', '--workers', type=int, default=0, help='local worker processes')
+    coordinator.add_argument('-cs', '--chunk_size', type=int, default=4, help='pages per task')
+    coordinator.add_argument('-wd', '--image_width', type=float, help='mm')
+    coordinator.add_argument('-hg', '--image_height', type=float, help='mm')
+    coordinator.add_argument('-dp', '--dpi', type=int, default=300)
+    coordinator.add_argument('-ps', '--paper', default='A4', help='media name from catalog, e.g. A4, Roll 914mm')
+    coordinator.add_argument('-or', '--orientation', choices=['portrait', 'landscape'], default='portrait')
+    coordinator.add_argument('-pd', '--page_padding', type=float, nargs=4, default=(0, 0, 0, 0),
+                             help='left top right bottom (mm)')
+    coordinator.add_argument('-ol', '--overlap', type=float, default=0, help='neighbour pages overlap (mm)')
+    coordinator.add_argument('-pg', '--pages', nargs='+', help='zero based pages to render: 3 2-5 r1 c2 r1c2')
+    coordinator.add_argument('-rm', '--registration_marks', action='store_true')
+    coordinator.add_argument('-pl', '--page_labels', action='store_true')
+    coordinator.add_argument('-cp', '--output_profile', help='printer ICC profile path or sRGB')
+    coordinator.add_argument('-mb', '--memory_budget', type=int, help='peak memory limit of each worker (MB)')
+    opt = parser.parse_args(args)
+    authkey = os.environ.get('PW_TILE_AUTHKEY', '').encode()
+    if not authkey:
+        parser.error('PW_TILE_AUTHKEY environment variable with coordinator auth key is required')
+    if opt.mode == 'worker':
+        run_worker(parse_address(opt.address), authkey=authkey)
+        return
+
+    from .tiler import ORIENT_PORTRAIT, ORIENT_LANDSCAPE
+    from .media import MediaCatalog
+    media = MediaCatalog().get(opt.paper)
+    tiler = Tiler(Path(opt.image))
+    width, height = opt.image_width, opt.image_height
+    if not width and not height:
+        width, height = tiler.image_size_mm
+    elif not height:
+        height = width * tiler.image.height / tiler.image.width
+    elif not width:
+        width = height * tiler.image.width / tiler.image.height
+    tiles = render_distributed(
+        Path(opt.image), Path(opt.output),
+        workers=opt.workers,
+        address=parse_address(opt.bind),
+        authkey=authkey,
+        chunk_size=opt.chunk_size,
+        image_size=(width, height),
+        dpi=opt.dpi,
+        page_size=media.size,
+        page_orient=ORIENT_LANDSCAPE if opt.orientation == 'landscape' else ORIENT_PORTRAIT,
+        padding=opt.page_padding,
+        overlap=opt.overlap,
+        pages=opt.pages,
+        registration_marks=opt.registration_marks,
+        page_labels=opt.page_labels,
+        output_profile=opt.output_profile,
+        memory_budget=opt.memory_budget and opt.memory_budget * 2**20,
+    )
+    for page in tiles['pages']:
+        print(page['image'])
+
+
+if __name__ == '__main__':
+    main()
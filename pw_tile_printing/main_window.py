@@ -1,3 +1,4 @@
+import math
 import tempfile
 import traceback
 
@@ -7,6 +8,9 @@ from PySide6.QtCore import *
 from pathlib import Path
 from .widgets.canvas_view import CanvasView
 from .tiler import ORIENT_PORTRAIT, ORIENT_LANDSCAPE, Tiler
+from .budget import plan_render
+from .session import Session, ImageLoader
+from .media import Media, MediaCatalog
 
 resource_path = Path(__file__).parent / "resources"
 window_icon_path = resource_path/"tiler.png"
@@ -41,6 +45,10 @@ class TilerMainWindow(QMainWindow):
         self.paper_cbb = PaperCombo()
         self.paper_cbb.currentIndexChanged.connect(self.refresh_canvas)
         self.toolbar.addWidget(self.paper_cbb)
+        self.add_media_btn = QToolButton(clicked=self.add_custom_media)
+        self.add_media_btn.setText("+")
+        self.add_media_btn.setToolTip("Add custom page size")
+        self.toolbar.addWidget(self.add_media_btn)
 
         rb_widget = QWidget(self)
         rb_layout = QHBoxLayout()
@@ -64,6 +72,15 @@ class TilerMainWindow(QMainWindow):
         self.padding_wd = PaddingWidget()
         self.padding_wd.valueChanged.connect(self.refresh_canvas)
         self.toolbar.addWidget(self.padding_wd)
+        self.toolbar.addWidget(QPushButton('Printer Margins', clicked=self.apply_printer_margins))
+
+        self.overlap_sb = QSpinBox()
+        self.overlap_sb.setPrefix("Overlap: ")
+        self.overlap_sb.setSuffix(" mm")
+        self.overlap_sb.setRange(0, 50)
+        self.overlap_sb.setMinimumWidth(50)
+        self.overlap_sb.editingFinished.connect(self.refresh_canvas)
+        self.toolbar.addWidget(self.overlap_sb)
 
         self.image_path_le = QLineEdit()
         self.toolbar.addWidget(self.image_path_le)
@@ -79,15 +96,78 @@ class TilerMainWindow(QMainWindow):
         self.canvas_view.s.imageChanged.connect(self.refresh_info)
         self.layout.addWidget(self.canvas_view)
         self._current_info = {}
+        self.session = Session()
+        self._image_loader = None
+        self._info_tiler = None
 
+        self.restore_session()
         self.refresh_canvas()
         self.__add_console()
         self.show()
 
     def closeEvent(self, event):
         self.status_bar.showMessage("Closing")
+        self.save_session()
         event.accept()
 
+    def session_options(self):
+        options = dict(
+            paper=self.paper_cbb.currentText(),
+            orient=ORIENT_PORTRAIT if self.orient_p.isChecked() else ORIENT_LANDSCAPE,
+            dpi=self.dpi_sb.value(),
+            padding=self.padding_wd.get_padding(),
+            overlap=self.overlap_sb.value(),
+            image_path=self.get_current_image(),
+        )
+        item = self.canvas_view.s.image_item
+        if item:
+            options['image_geometry'] = (item.x, item.y, item.w, item.h)
+        return options
+
+    def save_session(self):
+        item = self.canvas_view.s.image_item
+        try:
+            self.session.save(self.session_options(), item.pix.toImage() if item else None)
+        except Exception:
+            traceback.print_exc()
+
+    def restore_session(self):
+        """
+        Restore last session options. Image is shown from cached preview and
+        full resolution image is loaded in background
+        """
+        options = self.session.load()
+        if not options:
+            return
+        paper_index = self.paper_cbb.findText(options.get('paper', ''))
+        if paper_index >= 0:
+            self.paper_cbb.setCurrentIndex(paper_index)
+        self.orient_p.setChecked(options.get('orient', ORIENT_PORTRAIT) == ORIENT_PORTRAIT)
+        self.orient_l.setChecked(options.get('orient', ORIENT_PORTRAIT) == ORIENT_LANDSCAPE)
+        self.dpi_sb.setValue(options.get('dpi', self.dpi_sb.value()))
+        self.padding_wd.set_padding(options.get('padding', self.padding_wd.get_padding()))
+        self.overlap_sb.setValue(options.get('overlap', 0))
+        path = options.get('image_path')
+        if not path or not Path(path).is_file():
+            return
+        preview = self.session.load_preview(options)
+        if preview:
+            self.image_path_le.setText(path)
+            self.canvas_view.s.set_image(path, pixmap=QPixmap.fromImage(preview))
+            self._image_loader = ImageLoader(path)
+            self._image_loader.setAutoDelete(False)
+            self._image_loader.signals.loaded.connect(self._on_image_loaded)
+            self._image_loader.start()
+        else:
+            self.set_image(path)
+        if options.get('image_geometry') and self.canvas_view.s.image_item:
+            self.canvas_view.s.image_item.set_geometry(*options['image_geometry'])
+
+    def _on_image_loaded(self, path, image):
+        item = self.canvas_view.s.image_item
+        if item and path == self.get_current_image() and not image.isNull():
+            item.set_pixmap(QPixmap.fromImage(image))
+
     def about(self):
         QMessageBox.about(self, "About Tiler", "Tiler v0.1")
 
@@ -96,8 +176,12 @@ class TilerMainWindow(QMainWindow):
         keep_aspect = True
         path = self.image_path_le.text()
         paper_size = self.paper_cbb.get_paper_size()
-        paper_size = (paper_size[0] - padding[0] - padding[2], paper_size[1] - padding[1] - padding[3])
         orientation = ORIENT_PORTRAIT if self.orient_p.isChecked() else ORIENT_LANDSCAPE
+        if paper_size[1] is None:
+            # roll media, page is long as the whole scene
+            paper_size = (paper_size[0], self.canvas_view.s.sceneRect().height())
+            orientation = ORIENT_PORTRAIT
+        paper_size = (paper_size[0] - padding[0] - padding[2], paper_size[1] - padding[1] - padding[3])
         dpi = self.dpi_sb.value()
         self.canvas_view.s.draw_pages(
             padding=padding,
@@ -106,18 +190,46 @@ class TilerMainWindow(QMainWindow):
             paper_size=paper_size,
             orientation=orientation,
             dpi=dpi,
+            overlap=self.overlap_sb.value(),
         )
 
     def refresh_info(self, **kwargs):
         opt = self.collect_options()
+        page_width, page_height = opt['page_size']
+        if page_height is None:
+            # roll media, page is long as the image
+            page_height = f"{round(opt['image_size'][1] + opt['padding'][1] + opt['padding'][3], 2)}mm (roll)"
+        else:
+            page_height = f'{page_height}mm'
         text = '  |  '.join([
-            f"Page size: {opt['page_size'][0]}mm x {opt['page_size'][1]}mm",
+            f"Page size: {page_width}mm x {page_height}",
             f"Page count: {opt['page_count']}",
             f"Image size: {round(opt['image_size'][0], 2)}mm x {round(opt['image_size'][1], 2)}mm",
             f"Offset: {round(opt['offset'][0], 2)}mm x {round(opt['offset'][1], 2)}mm",
-            ])
+            ] + self.memory_info(opt))
         self.info_line_lb.setText(text)
 
+    def memory_info(self, opt):
+        """
+        Estimated peak memory and render strategy of saving tiles with current options
+        """
+        path = self.get_current_image().strip()
+        if not path or not self.canvas_view.s.image_item:
+            return []
+        try:
+            if self._info_tiler is None or self._info_tiler.path != Path(path):
+                # header only, pixels are not loaded
+                self._info_tiler = Tiler(Path(path))
+            tiler = self._info_tiler
+            plan = tiler.plan_tiles(**opt)
+            render_plan = plan_render(plan, tiler.image.size, tiler.image.mode)
+        except Exception:
+            return []
+        text = f"Memory: ~{math.ceil(render_plan['peak'] / 2**20)}MB ({render_plan['strategy']})"
+        if not render_plan['fits']:
+            text += f" exceeds {render_plan['budget'] // 2**20}MB"
+        return [text]
+
     def browse_image(self):
         path = QFileDialog.getOpenFileName(self, "Open Image", filter='Images (*.png *.jpg)')
         if path:
@@ -184,11 +296,13 @@ class TilerMainWindow(QMainWindow):
         page_size = self.get_current_page_size()
         orient = ORIENT_PORTRAIT if self.orient_p.isChecked() else ORIENT_LANDSCAPE
         page_size = Tiler.orient_page(page_size, orient)
+        overlap = self.overlap_sb.value()
         image_info['offset'] = (
-            image_info['offset'][0] % (page_size[0]-padding[0]-padding[2]),
-            image_info['offset'][1] % (page_size[1]-padding[1]-padding[3]))
+            image_info['offset'][0] % (page_size[0]-padding[0]-padding[2]-overlap),
+            image_info['offset'][1] % (page_size[1]-padding[1]-padding[3]-overlap) if page_size[1] else 0)
         return dict(**image_info,
                     padding=padding,
+                    overlap=overlap,
                     page_count=self.canvas_view.s.active_pages,
                     page_orient=orient,
                     dpi=self.dpi_sb.value(),
@@ -198,6 +312,32 @@ class TilerMainWindow(QMainWindow):
     def get_current_page_size(self):
         return self.paper_cbb.get_paper_size()
 
+    def add_custom_media(self):
+        dial = CustomMediaDialog(self)
+        if dial.exec():
+            try:
+                self.paper_cbb.catalog.add(dial.get_media())
+            except ValueError as e:
+                QMessageBox.warning(self, "Warning", str(e), QMessageBox.StandardButton.Ok)
+                return
+            self.paper_cbb.init_items(dial.get_media().name)
+
+    def apply_printer_margins(self):
+        """
+        Set padding from printer hardware margins of current media
+        """
+        from .print_manager import get_printers, get_printer_margins
+        dial = SelectPrinterDialog(get_printers())
+        if not dial.exec() or not dial.selected_printer():
+            return
+        media = self.paper_cbb.get_media()
+        margins = get_printer_margins(dial.selected_printer(), media.name)
+        if margins is None:
+            QMessageBox.warning(self, "Warning", f"Printer has no media {media.name}", QMessageBox.StandardButton.Ok)
+            return
+        self.padding_wd.set_padding([math.ceil(value) for value in margins])
+        self.refresh_canvas()
+
     def __add_console(self):
         try:
             from py_console import console
@@ -213,17 +353,49 @@ class PaperCombo(QComboBox):
         super().__init__(*args, **kwargs)
         self.init_items()
 
-    def init_items(self):
-        from .import tiler
-        for i, (name, value) in enumerate(tiler.__dict__.items()):
-            if name.startswith("PAPER_") and not name.endswith("_"):
-                self.addItem(name.split("_")[1].title(), userData=value)
-        self.setCurrentIndex(1)
+    def init_items(self, current='A4'):
+        self.catalog = MediaCatalog()
+        self.blockSignals(True)
+        self.clear()
+        for media in self.catalog:
+            self.addItem(media.name, userData=media.size)
+        self.blockSignals(False)
+        self.setCurrentIndex(max(0, self.findText(current)))
+
+    def get_media(self):
+        return self.catalog.get(self.currentText())
 
     def get_paper_size(self):
         return self.currentData()
 
 
+class CustomMediaDialog(QDialog):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setWindowTitle("Custom Page Size")
+        self.ly = QFormLayout(self)
+        self.name_le = QLineEdit()
+        self.ly.addRow("Name", self.name_le)
+        self.width_sb = QDoubleSpinBox(suffix=" mm", maximum=10000, value=210)
+        self.ly.addRow("Width", self.width_sb)
+        self.height_sb = QDoubleSpinBox(suffix=" mm", maximum=100000, value=297)
+        self.ly.addRow("Height", self.height_sb)
+        self.roll_cb = QCheckBox("Roll media")
+        self.roll_cb.toggled.connect(lambda checked: self.height_sb.setDisabled(checked))
+        self.ly.addRow(self.roll_cb)
+        self.ly.addRow(QPushButton('Add', clicked=self.accept))
+        self.ly.addRow(QPushButton('Cancel', clicked=self.reject))
+
+    def accept(self):
+        if self.name_le.text().strip() and self.width_sb.value():
+            super().accept()
+
+    def get_media(self):
+        return Media(self.name_le.text().strip(),
+                     self.width_sb.value(),
+                     None if self.roll_cb.isChecked() else self.height_sb.value())
+
+
 class PaddingWidget(QWidget):
     valueChanged = Signal()
 
@@ -243,6 +415,10 @@ class PaddingWidget(QWidget):
             self.widgets[pos] = s
             s.editingFinished.connect(self.valueChanged.emit)
 
+    def set_padding(self, padding):
+        for pos, value in zip(['left', 'top', 'right', 'bottom'], padding):
+            self.widgets[pos].setValue(value)
+
     def get_padding(self):
         return (
             self.widgets['left'].value(),
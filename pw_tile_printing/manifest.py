@@ -0,0 +1,106 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+
+class JobManifest:
+    """
+    SQLite sidecar stored next to rendered pages.
+
+    Keeps job parameters, layout plan and per-page completion with checksums.
+    Rerun of the same job skips verified pages, several processes (or machines
+    with shared directory) can render different page ranges of one job.
+    """
+    suffix = '.job.sqlite'
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.conn = sqlite3.connect(self.path.as_posix(), timeout=60, isolation_level=None)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS pages ('
+                          'page INTEGER PRIMARY KEY, path TEXT, checksum TEXT, finished REAL)')
+
+    @classmethod
+    def for_output(cls, save_dir: Path, filename: str) -> 'JobManifest':
+        """
+        Manifest for output files pattern
+
+        :param save_dir: output directory
+        :param filename: page filename pattern (after fix_format)
+        """
+        # whole pattern, so page_##.png and page_####.png jobs in one directory do not share manifest
+        name = re.sub(r'\{:?([^}]*)\}', lambda m: re.sub(r'\W', '', m.group(1)), Path(filename).stem)
+        return cls(Path(save_dir) / f"{name.strip('_-. ') or 'tiles'}{cls.suffix}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def start(self, params: dict, plan: dict) -> bool:
+        """
+        Register job. Completed pages are dropped if stored job is different.
+
+        :param params: render parameters, must be json serializable
+        :param plan: layout plan, must be json serializable
+        :return: True if manifest was reset
+        """
+        fingerprint = make_fingerprint(params, plan)
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute("SELECT value FROM job WHERE key='fingerprint'").fetchone()
+            reset = not row or row[0] != fingerprint
+            if reset:
+                self.conn.execute('DELETE FROM pages')
+                self.conn.executemany('INSERT OR REPLACE INTO job VALUES (?, ?)', [
+                    ('fingerprint', fingerprint),
+                    ('params', json.dumps(params)),
+                    ('plan', json.dumps(plan)),
+                    ('created', str(time.time())),
+                ])
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return reset
+
+    def get(self, key: str):
+        row = self.conn.execute('SELECT value FROM job WHERE key=?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_done(self, page: int, path: Path) -> bool:
+        """
+        Page is completed and file on disk matches stored checksum
+        """
+        row = self.conn.execute('SELECT path, checksum FROM pages WHERE page=?', (page,)).fetchone()
+        if not row or Path(row[0]) != Path(path) or not Path(path).is_file():
+            return False
+        return file_checksum(path) == row[1]
+
+    def mark_done(self, page: int, path: Path):
+        self.conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                          (page, Path(path).as_posix(), file_checksum(path), time.time()))
+
+    def completed_pages(self) -> list:
+        return [row[0] for row in self.conn.execute('SELECT page FROM pages ORDER BY page')]
+
+
+def make_fingerprint(params: dict, plan: dict) -> str:
+    data = json.dumps(dict(params=params, plan=plan), sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def file_checksum(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,189 @@
+"""
+Page marks: crop marks, registration crosses, overlap alignment ticks and page labels.
+
+Marks of one page geometry are rasterized once to a 1-bit mask, kept packed
+(8 pixels per byte), and applied to every page of this geometry with a single composite.
+"""
+from functools import lru_cache, cached_property
+from PIL import Image, ImageDraw, ImageFont
+
+
+class MarkOverlay:
+    """
+    Marks of one page geometry
+
+    :param size: page size (pixels)
+    :param shapes: list of ('line' | 'ellipse', (x1, y1, x2, y2), width) in page pixels
+    """
+    def __init__(self, size: tuple, shapes: list):
+        self.size = tuple(size)
+        self.shapes = shapes
+
+    @cached_property
+    def packed_mask(self) -> bytes:
+        """
+        Page mask bits, rows are padded to whole bytes
+        """
+        return self.draw_mask((0, 0) + self.size).tobytes()
+
+    def mask(self, top: int = 0, bottom: int = None) -> Image.Image:
+        """
+        Mask of page rows, unpacked from cached bits without drawing
+
+        :param top: first row (pixels)
+        :param bottom: row after the last one (pixels), page height if None
+        """
+        bottom = self.size[1] if bottom is None else bottom
+        stride = (self.size[0] + 7) // 8
+        return Image.frombytes('1', (self.size[0], bottom - top), self.packed_mask[top*stride:bottom*stride])
+
+    def draw_mask(self, box: tuple) -> Image.Image:
+        """
+        Rasterize shapes inside page region
+
+        :param box: page region (pixels): left, top, right, bottom
+        """
+        mask = Image.new('1', (box[2]-box[0], box[3]-box[1]), 0)
+        draw = ImageDraw.Draw(mask)
+        for kind, (x1, y1, x2, y2), width in self.shapes:
+            if max(x1, x2) + width < box[0] or min(x1, x2) - width > box[2] or \
+                    max(y1, y2) + width < box[1] or min(y1, y2) - width > box[3]:
+                continue
+            xy = (x1-box[0], y1-box[1], x2-box[0], y2-box[1])
+            if kind == 'line':
+                draw.line(xy, fill=255, width=width)
+            else:
+                draw.ellipse(xy, outline=255, width=width)
+        del draw
+        return mask
+
+    def apply(self, img: Image.Image, color: tuple = (0, 0, 0)):
+        if self.shapes:
+            img.paste(color, (0, 0), self.mask())
+
+
+@lru_cache(maxsize=16)
+def get_mark_overlay(size: tuple,
+                     content_box: tuple,
+                     printable_box: tuple,
+                     width: int,
+                     cut_line_height: int = None,
+                     registration_size: int = None,
+                     overlap: int = 0,
+                     neighbours: tuple = (False, False, False, False),
+                     ) -> MarkOverlay:
+    """
+    Cached marks overlay of page geometry, all values in pixels
+
+    :param size: page size
+    :param content_box: image content on page: left, top, right, bottom
+    :param printable_box: page without padding: left, top, right, bottom
+    :param width: line width
+    :param cut_line_height: corner crop marks length, 0 for full border, None to skip
+    :param registration_size: registration cross diameter, None to skip
+    :param overlap: overlap with neighbour pages, alignment ticks are added if not 0
+    :param neighbours: page has neighbour: left, top, right, bottom
+    """
+    shapes = []
+    if cut_line_height is not None:
+        shapes.extend(crop_marks(printable_box, cut_line_height, width))
+    if registration_size:
+        shapes.extend(registration_marks(size, printable_box, registration_size, width))
+    if overlap:
+        tick = cut_line_height or registration_size or width * 20
+        shapes.extend(overlap_marks(content_box, neighbours, overlap, tick, width))
+    return MarkOverlay(size, shapes)
+
+
+def crop_marks(box: tuple, height: int, width: int) -> list:
+    """
+    Corner lines of box, full border if height is 0
+    """
+    left, top, right, bottom = box
+    if not height:
+        return [('line', line, width) for line in (
+            (left, top, right, top), (right, top, right, bottom),
+            (right, bottom, left, bottom), (left, bottom, left, top))]
+    return [('line', line, width) for line in (
+        (left, top, left + height, top), (left, top, left, top + height),
+        (right, top, right - height, top), (right, top, right, top + height),
+        (right, bottom, right - height, bottom), (right, bottom, right, bottom - height),
+        (left, bottom, left + height, bottom), (left, bottom, left, bottom - height))]
+
+
+def registration_marks(size: tuple, box: tuple, diameter: int, width: int) -> list:
+    """
+    Circle with cross at middle of each box edge.
+    Placed on padding if it is wide enough, else inside the box.
+    """
+    left, top, right, bottom = box
+    radius = diameter // 2
+    margins = (left, top, size[0] - right, size[1] - bottom)
+    shift = [-radius if margin > diameter else radius for margin in margins]
+    centers = ((left + shift[0], (top + bottom) // 2),
+               ((left + right) // 2, top + shift[1]),
+               (right - shift[2], (top + bottom) // 2),
+               ((left + right) // 2, bottom - shift[3]))
+    shapes = []
+    for x, y in centers:
+        shapes.append(('ellipse', (x - radius // 2, y - radius // 2, x + radius // 2, y + radius // 2), width))
+        shapes.append(('line', (x - radius, y, x + radius, y), width))
+        shapes.append(('line', (x, y - radius, x, y + radius), width))
+    return shapes
+
+
+def overlap_marks(box: tuple, neighbours: tuple, overlap: int, height: int, width: int) -> list:
+    """
+    Ticks on content edges where neighbour page content starts/ends
+    """
+    left, top, right, bottom = box
+    shapes = []
+    for has_neighbour, x in ((neighbours[0], left + overlap), (neighbours[2], right - overlap)):
+        if has_neighbour:
+            shapes.append(('line', (x, top, x, top + height), width))
+            shapes.append(('line', (x, bottom, x, bottom - height), width))
+    for has_neighbour, y in ((neighbours[1], top + overlap), (neighbours[3], bottom - overlap)):
+        if has_neighbour:
+            shapes.append(('line', (left, y, left + height, y), width))
+            shapes.append(('line', (right, y, right - height, y), width))
+    return shapes
+
+
+@lru_cache(maxsize=1024)
+def label_stamp(text: str, height: int) -> Image.Image:
+    """
+    Cached text mask
+    """
+    try:
+        font = ImageFont.load_default(size=height)
+    except TypeError:
+        # Pillow < 10.1 has only small bitmap font
+        font = ImageFont.load_default()
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new('L', (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+    return mask
+
+
+def apply_label(img: Image.Image, text: str, box: tuple, height: int, color: tuple = (0, 0, 0),
+                page_height: int = None, top: int = 0):
+    """
+    Paste page label under bottom left corner of box, or inside it if padding is too small
+
+    :param img: page image or page band
+    :param text: label
+    :param box: page without padding (pixels): left, top, right, bottom
+    :param height: text height (pixels)
+    :param color: text color
+    :param page_height: full page height if img is band (pixels)
+    :param top: band position on page (pixels)
+    """
+    stamp = label_stamp(text, height)
+    gap = max(1, height // 4)
+    if (page_height or img.height) - box[3] >= stamp.height + gap:
+        pos = (box[0] + gap, box[3] + gap - top)
+    else:
+        pos = (box[0] + gap * 2, box[3] - stamp.height - gap * 2 - top)
+    if pos[1] + stamp.height <= 0 or pos[1] >= img.height:
+        return
+    img.paste(color, pos + (pos[0] + stamp.width, pos[1] + stamp.height), stamp)
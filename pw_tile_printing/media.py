@@ -0,0 +1,84 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from .tiler import PAPER_A3, PAPER_A4, PAPER_A5, PAPER_A6
+
+CATALOG_PATH = Path.home() / '.config' / 'pw_tile_printing' / 'media.json'
+
+
+@dataclass
+class Media:
+    """
+    Page media. Roll media has fixed width and no height, page length follows the image
+
+    :param name: media name, same as PPD media keyword for printer margins lookup
+    :param width: (mm)
+    :param height: (mm), None for roll
+    """
+    name: str
+    width: float
+    height: float = None
+    custom: bool = False
+
+    @property
+    def is_roll(self) -> bool:
+        return self.height is None
+
+    @property
+    def size(self) -> tuple:
+        return self.width, self.height
+
+
+BUILTIN_MEDIA = (
+    Media('A3', *PAPER_A3),
+    Media('A4', *PAPER_A4),
+    Media('A5', *PAPER_A5),
+    Media('A6', *PAPER_A6),
+    Media('Letter', 215.9, 279.4),
+    Media('Legal', 215.9, 355.6),
+    Media('Roll 610mm', 610),
+    Media('Roll 914mm', 914),
+)
+
+
+class MediaCatalog:
+    """
+    Built-in and custom media. Custom media are stored in json file
+    """
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = Path(path)
+        self.media = {media.name: media for media in BUILTIN_MEDIA}
+        if self.path.is_file():
+            for data in json.loads(self.path.read_text()):
+                self.media[data['name']] = Media(**dict(data, custom=True))
+
+    def __iter__(self):
+        return iter(self.media.values())
+
+    def get(self, name: str) -> Media:
+        try:
+            return self.media[name]
+        except KeyError:
+            raise KeyError(f'Unknown media: {name}')
+
+    def add(self, media: Media):
+        """
+        Add custom media and save catalog
+        """
+        if media.name in self.media and not self.media[media.name].custom:
+            raise ValueError(f'Built-in media can not be replaced: {media.name}')
+        media.custom = True
+        self.media[media.name] = media
+        self.save()
+
+    def remove(self, name: str):
+        if not self.get(name).custom:
+            raise ValueError(f'Built-in media can not be removed: {name}')
+        del self.media[name]
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        custom = [dict(name=m.name, width=m.width, height=m.height) for m in self if m.custom]
+        self.path.write_text(json.dumps(custom, indent=2))
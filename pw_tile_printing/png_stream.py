@@ -0,0 +1,74 @@
+import struct
+import zlib
+
+from PIL import Image, ImageChops
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {'L': 0, 'RGB': 2}
+
+
+class PngStreamWriter:
+    """
+    Write PNG band by band to binary stream, whole image is never kept in memory
+
+    :param stream: binary file-like object with write()
+    :param size: image size (pixels)
+    :param mode: 'RGB' or 'L'
+    :param dpi: resolution stored in pHYs chunk
+    :param icc_profile: ICC profile bytes stored in iCCP chunk
+    :param compress_level: zlib compression level
+    """
+    def __init__(self, stream, size: tuple, mode: str = 'RGB', dpi: int = None,
+                 icc_profile: bytes = None, compress_level: int = 6):
+        if mode not in COLOR_TYPES:
+            raise ValueError(f'Unsupported mode: {mode}')
+        self.stream = stream
+        self.size = tuple(size)
+        self.mode = mode
+        self.rows = 0
+        self._last_row = None
+        self.compressor = zlib.compressobj(compress_level)
+        self.stream.write(PNG_SIGNATURE)
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8, COLOR_TYPES[mode], 0, 0, 0))
+        if dpi:
+            ppm = int(round(dpi / 0.0254))
+            self.write_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1))
+        if icc_profile:
+            self.write_chunk(b'iCCP', b'ICC Profile\x00\x00' + zlib.compress(icc_profile))
+
+    def write_chunk(self, chunk_type: bytes, data: bytes):
+        self.stream.write(struct.pack('>I', len(data)))
+        self.stream.write(chunk_type)
+        self.stream.write(data)
+        self.stream.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def write_band(self, band: Image.Image):
+        """
+        Append rows of band, band width must be equal to image width
+        """
+        if band.width != self.size[0]:
+            raise ValueError(f'Band width {band.width} != image width {self.size[0]}')
+        if self.rows + band.height > self.size[1]:
+            raise ValueError('Image height exceeded')
+        if band.mode != self.mode:
+            band = band.convert(self.mode)
+        # PNG "Up" filter: difference with previous row, computed for whole band at once
+        prior = Image.new(self.mode, band.size)
+        if self._last_row is not None:
+            prior.paste(self._last_row, (0, 0))
+        prior.paste(band.crop((0, 0, band.width, band.height - 1)), (0, 1))
+        self._last_row = band.crop((0, band.height - 1, band.width, band.height))
+        data = ImageChops.subtract_modulo(band, prior).tobytes()
+        row_size = len(data) // band.height
+        # filter type byte before each row
+        raw = b''.join(b'\x02' + data[i:i+row_size] for i in range(0, len(data), row_size))
+        compressed = self.compressor.compress(raw)
+        if compressed:
+            self.write_chunk(b'IDAT', compressed)
+        self.rows += band.height
+
+    def close(self):
+        if self.rows != self.size[1]:
+            raise ValueError(f'Image is not complete: {self.rows} of {self.size[1]} rows written')
+        self.write_chunk(b'IDAT', self.compressor.flush())
+        self.write_chunk(b'IEND', b'')
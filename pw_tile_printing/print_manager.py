@@ -1,5 +1,12 @@
+import json
+import os
+from pathlib import Path
+
 import cups
 
+CAPS_CACHE_PATH = Path.home() / '.cache' / 'pw_tile_printing' / 'printer_caps.json'
+_caps_cache = {}
+
 
 def print_image(path: str, printer_name: str) -> int:
     """
@@ -16,6 +23,65 @@ def print_image(path: str, printer_name: str) -> int:
     return print_job
 
 
+class PrintStream:
+    """
+    Binary stream to printer spool, e.g. for Tiler.stream_page.
+    Data goes to CUPS as it is written, without temporary file.
+
+    :param printer_name:
+    :param title: job title
+    :param doc_format: document mime type
+    """
+    def __init__(self, printer_name: str, title: str = "Image Print", doc_format: str = 'image/png'):
+        self.conn = cups.Connection()
+        if printer_name not in self.conn.getPrinters():
+            raise ValueError(f"Error: Printer '{printer_name}' not found.")
+        self.printer_name = printer_name
+        self.job_id = self.conn.createJob(printer_name, title, {})
+        self.conn.startDocument(printer_name, self.job_id, title, doc_format, 1)
+
+    def write(self, data: bytes):
+        self.conn.writeRequestData(data, len(data))
+
+    def close(self):
+        self.conn.finishDocument(self.printer_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.conn.cancelJob(self.job_id)
+
+
+def stream_pages(tiler, plan: dict, printer_name: str, pages: list = None, band_rows: int = None,
+                 output_profile: str = None, rendering_intent: str = 'perceptual', **mark_options) -> list:
+    """
+    Render pages band by band straight to printer spool, page files are not written
+
+    :param tiler: Tiler of source image
+    :param plan: layout from Tiler.plan_tiles
+    :param printer_name:
+    :param pages: page indexes, all pages if None
+    :param band_rows: band height (pixels)
+    :param output_profile: printer ICC profile, see Tiler.render_pages
+    :param rendering_intent: perceptual, relative, saturation or absolute
+    :param mark_options: marks and labels options of Tiler.stream_page
+    :return: print job ids
+    """
+    from .tiler import DEFAULT_BAND_ROWS
+    color_transform = tiler.color_transform(output_profile, rendering_intent) if output_profile else None
+    jobs = []
+    for page_num in (range(len(plan['rects'])) if pages is None else pages):
+        with PrintStream(printer_name, title=f'{tiler.path.name} #{page_num}') as stream:
+            tiler.stream_page(plan, page_num, stream, band_rows=band_rows or DEFAULT_BAND_ROWS,
+                              color_transform=color_transform, **mark_options)
+        jobs.append(stream.job_id)
+    return jobs
+
+
 def get_printers() -> tuple:
     """
     Get printer name list
@@ -24,3 +90,56 @@ def get_printers() -> tuple:
     printers = conn.getPrinters()
     return tuple(printers.keys())
 
+
+def get_printer_capabilities(printer_name: str, refresh: bool = False) -> dict:
+    """
+    Media sizes and printable area margins from printer PPD.
+    PPD is queried once per printer, result is cached in memory and on disk.
+
+    :param printer_name:
+    :param refresh: query printer again
+    :return: dict: media keyword -> dict(size=(w, h), margins=(left, top, right, bottom)), all in mm
+    """
+    if not _caps_cache and CAPS_CACHE_PATH.is_file():
+        _caps_cache.update(json.loads(CAPS_CACHE_PATH.read_text()))
+    if refresh or printer_name not in _caps_cache:
+        _caps_cache[printer_name] = query_printer_capabilities(printer_name)
+        CAPS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CAPS_CACHE_PATH.write_text(json.dumps(_caps_cache, indent=2))
+    return _caps_cache[printer_name]
+
+
+def get_printer_margins(printer_name: str, media_name: str) -> tuple:
+    """
+    Hardware margins of media (mm): left, top, right, bottom. None if printer has no such media
+    """
+    media = get_printer_capabilities(printer_name).get(media_name)
+    return tuple(media['margins']) if media else None
+
+
+def query_printer_capabilities(printer_name: str) -> dict:
+    conn = cups.Connection()
+    ppd_path = conn.getPPD(printer_name)
+    try:
+        ppd = cups.PPD(ppd_path)
+        sizes = {}
+        areas = {}
+        for attr in ppd.attributes:
+            if attr.name == 'PaperDimension':
+                sizes[attr.spec] = [float(v) for v in attr.value.split()]
+            elif attr.name == 'ImageableArea':
+                areas[attr.spec] = [float(v) for v in attr.value.split()]
+    finally:
+        os.remove(ppd_path)
+    caps = {}
+    for name, (width, height) in sizes.items():
+        left, bottom, right, top = areas.get(name, (0, 0, width, height))
+        caps[name] = dict(
+            size=(pt_to_mm(width), pt_to_mm(height)),
+            margins=(pt_to_mm(left), pt_to_mm(height - top), pt_to_mm(width - right), pt_to_mm(bottom)),
+        )
+    return caps
+
+
+def pt_to_mm(points: float) -> float:
+    return round(points * 25.4 / 72, 2)
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+from PySide6.QtCore import QSettings, QStandardPaths, QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QImage
+
+PREVIEW_SIZE = 1024
+
+
+class Session:
+    """
+    Last session UI options and cached preview of last image
+    """
+    def __init__(self, settings: QSettings = None, cache_dir: Path = None):
+        self.settings = settings or QSettings('paulwinex', 'pw_tile_printing')
+        self.cache_dir = Path(cache_dir or QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.CacheLocation)) / 'pw_tile_printing'
+
+    @property
+    def preview_path(self) -> Path:
+        return self.cache_dir / 'preview.png'
+
+    def load(self) -> dict:
+        try:
+            return json.loads(self.settings.value('session', '{}'))
+        except (TypeError, ValueError):
+            return {}
+
+    def save(self, options: dict, image: QImage = None):
+        """
+        Save options and preview of current image
+
+        :param options: json serializable options, 'image_path' is used to validate preview
+        :param image: full resolution image, preview is not updated if None
+        """
+        options = dict(options, image_stamp=image_stamp(options.get('image_path')))
+        if image is not None and not image.isNull():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            image.scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                         Qt.TransformationMode.SmoothTransformation).save(self.preview_path.as_posix())
+        self.settings.setValue('session', json.dumps(options))
+        self.settings.sync()
+
+    def load_preview(self, options: dict) -> QImage:
+        """
+        Cached preview if source image is not changed since session was saved
+        """
+        stamp = image_stamp(options.get('image_path'))
+        if not stamp or stamp != options.get('image_stamp') or not self.preview_path.is_file():
+            return None
+        image = QImage(self.preview_path.as_posix())
+        return None if image.isNull() else image
+
+
+def image_stamp(path) -> list:
+    if not path or not Path(path).is_file():
+        return None
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ImageLoader(QRunnable):
+    """
+    Load full resolution image in thread pool. QImage is safe to use outside of GUI thread
+    """
+    class Signals(QObject):
+        loaded = Signal(str, QImage)
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.signals = self.Signals()
+
+    def run(self):
+        self.signals.loaded.emit(self.path, QImage(self.path))
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)
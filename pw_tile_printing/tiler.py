@@ -1,8 +1,13 @@
 from pathlib import Path
-from PIL import Image,  ImageDraw
+from PIL import Image
 from functools import cached_property
 from dataclasses import dataclass
 from pprint import pprint
+from .manifest import JobManifest
+from .marks import MarkOverlay, get_mark_overlay, apply_label
+from .png_stream import PngStreamWriter
+from .color import ColorTransform, get_color_transform, SRGB
+from .budget import plan_render, estimate_memory, DEFAULT_BAND_ROWS, STRATEGY_FULL, STRATEGY_BAND
 
 
 PAPER_A3 = (297, 420)
@@ -34,32 +39,28 @@ class Tiler:
     def image_size_mm_y(self):
         return self.image_size_mm[1]
 
-    def make_tiles(self,
+    def plan_tiles(self,
                    image_size: tuple,
                    padding: tuple = (0, 0, 0, 0),
                    keep_aspect_ratio: bool = True,
-                   border_cut_line: bool = True,
-                   border_cut_line_height: int = 10,
                    dpi: int = 300,
                    page_size: tuple = PAPER_A4,
                    page_orient: int = ORIENT_PORTRAIT,
-                   save_path: Path = None,
                    offset: tuple = (0, 0),
+                   overlap: float = 0,
                    **kwargs
                    ) -> dict:
         """
-        Split and resize image to tiles
+        Compute pages layout without rendering
 
         :param image_size: output image size (mm)
         :param padding: print padding, depended on printer model (mm): left, top, right, bottom
         :param keep_aspect_ratio: keep aspect ratio on image resize
-        :param border_cut_line: add border cut line on image
-        :param border_cut_line_height:  (mm)
         :param dpi: printing dpi
-        :param page_size: page size (mm). Default A4
-        :param page_orient: page orientation
-        :param save_path: save result to files and return path list if not None, else return PIL.Image objects
+        :param page_size: page size (mm). Default A4. Height is None for roll media
+        :param page_orient: page orientation, ignored for roll media
         :param offset: global offset on page (mm)
+        :param overlap: each page repeats strip of neighbour page (mm)
         :return: dict
         """
         page_size = self.orient_page(page_size, orient=page_orient)
@@ -70,91 +71,415 @@ class Tiler:
         # get image size in mm
         full_img_w, full_img_h = (self.image_size_mm_x*scale_factor_x,
                                   self.image_size_mm_y*scale_factor_y)
+        roll = page_size[1] is None
+        if roll:
+            # roll media: one long page per column strip
+            page_size = (page_size[0], full_img_h + padding[1] + padding[3])
+            offset = (offset[0], 0)
         # get page size in mm without padding
         full_page_w, full_page_h = (page_size[0]-padding[0]-padding[2],
                                     page_size[1]-padding[1]-padding[3])
         image_rect = Rect(0, 0, full_img_w, full_img_h)
         page_rect = Rect(0, 0, full_page_w, full_page_h)
-        tiles = image_rect.tile_rects_in_area(page_rect, offset=offset, crop=True)
-        pprint(tiles)
-        # resize image to full size in mm using dpi
-        resized = self.image.resize((mm_to_px(full_img_w, dpi), mm_to_px(full_img_h, dpi)))
+        tiles = image_rect.tile_rects_in_area(page_rect, offset=offset, crop=True, overlap=overlap)
+        return dict(
+            image_size=(full_img_w, full_img_h),
+            page_size=tuple(page_size),
+            padding=tuple(padding),
+            dpi=dpi,
+            overlap=overlap,
+            roll=roll,
+            rows=tiles['rows'],
+            columns=tiles['columns'],
+            rects=tiles['rects'],
+        )
+
+    def make_tiles(self,
+                   image_size: tuple,
+                   padding: tuple = (0, 0, 0, 0),
+                   keep_aspect_ratio: bool = True,
+                   border_cut_line: bool = True,
+                   border_cut_line_height: int = 10,
+                   dpi: int = 300,
+                   page_size: tuple = PAPER_A4,
+                   page_orient: int = ORIENT_PORTRAIT,
+                   save_path: Path = None,
+                   offset: tuple = (0, 0),
+                   pages: list = None,
+                   resume: bool = True,
+                   overlap: float = 0,
+                   overlap_marks: bool = True,
+                   registration_marks: bool = False,
+                   page_labels: bool = False,
+                   band_rows: int = None,
+                   output_profile: str = None,
+                   rendering_intent: str = 'perceptual',
+                   strategy: str = None,
+                   memory_budget: int = None,
+                   **kwargs
+                   ) -> dict:
+        """
+        Split and resize image to tiles
+
+        :param image_size: output image size (mm)
+        :param padding: print padding, depended on printer model (mm): left, top, right, bottom
+        :param keep_aspect_ratio: keep aspect ratio on image resize
+        :param border_cut_line: add border cut line on image
+        :param border_cut_line_height:  (mm)
+        :param dpi: printing dpi
+        :param page_size: page size (mm). Default A4. Height is None for roll media
+        :param page_orient: page orientation
+        :param save_path: save result to files and return path list if not None, else return PIL.Image objects
+        :param offset: global offset on page (mm)
+        :param pages: pages to render, all pages if None. Indexes or selection spec, see select_pages
+        :param resume: skip pages already completed by previous run of the same job (job manifest)
+        :param overlap: each page repeats strip of neighbour page (mm)
+        :param overlap_marks: add alignment marks where neighbour page edges are
+        :param registration_marks: add registration crosses at middle of page edges
+        :param page_labels: add page number, row and column label
+        :param band_rows: render each page in bands of this many pixel rows streamed to file
+        :param output_profile: convert colors to printer/output ICC profile: 'sRGB' or path to ICC file
+        :param rendering_intent: perceptual, relative, saturation or absolute
+        :param strategy: full, page or band rendering, chosen by memory budget if None
+        :param memory_budget: peak memory limit (bytes), half of physical memory if None
+        :return: dict
+        """
+        plan = self.plan_tiles(image_size, padding=padding, keep_aspect_ratio=keep_aspect_ratio, dpi=dpi,
+                               page_size=page_size, page_orient=page_orient, offset=offset, overlap=overlap)
+        pprint(plan['rects'])
+        if pages is not None:
+            pages = select_pages(plan, pages)
+        return self.render_pages(plan,
+                                 pages=pages,
+                                 save_path=save_path,
+                                 border_cut_line=border_cut_line,
+                                 border_cut_line_height=border_cut_line_height,
+                                 overlap_marks=overlap_marks,
+                                 registration_marks=registration_marks,
+                                 page_labels=page_labels,
+                                 resume=resume,
+                                 band_rows=band_rows,
+                                 output_profile=output_profile,
+                                 rendering_intent=rendering_intent,
+                                 strategy=strategy,
+                                 memory_budget=memory_budget)
+
+    def render_pages(self,
+                     plan: dict,
+                     pages: list = None,
+                     save_path: Path = None,
+                     border_cut_line: bool = True,
+                     border_cut_line_height: int = 10,
+                     overlap_marks: bool = True,
+                     registration_marks: bool = False,
+                     page_labels: bool = False,
+                     resume: bool = True,
+                     band_rows: int = None,
+                     output_profile: str = None,
+                     rendering_intent: str = 'perceptual',
+                     strategy: str = None,
+                     memory_budget: int = None,
+                     ) -> dict:
+        """
+        Render pages of layout plan
+
+        :param plan: layout from plan_tiles
+        :param pages: page indexes to render, all pages if None
+        :param save_path: save result to files and return path list if not None, else return PIL.Image objects
+        :param border_cut_line: add border cut line on image
+        :param border_cut_line_height:  (mm)
+        :param overlap_marks: add alignment marks where neighbour page edges are, if plan has overlap
+        :param registration_marks: add registration crosses at middle of page edges
+        :param page_labels: add page number, row and column label
+        :param resume: skip pages already completed by previous run of the same job (job manifest)
+        :param band_rows: render each page in bands of this many pixel rows streamed to file,
+            page is never allocated whole. Used for roll media by default, requires save_path
+        :param output_profile: convert colors from source profile (sRGB if not embedded)
+            to printer/output ICC profile: 'sRGB' or path to ICC file
+        :param rendering_intent: perceptual, relative, saturation or absolute
+        :param strategy: full (resize whole image once), page (resample rows of pages)
+            or band (stream pages in bands). Fastest one fitting memory budget if None, see budget.plan_render
+        :param memory_budget: peak memory limit (bytes). MemoryError is raised if job can not fit it.
+            Half of physical memory if None, exceeding it only prints warning
+        :return: dict
+        """
+        if pages is None:
+            pages = range(len(plan['rects']))
+        pages = list(pages)
         # get save path
+        manifest = None
         if save_path:
             filename = fix_format(Path(Path(save_path).name or f'page_####.png').with_suffix('.png').name)
             save_path = Path(save_path).parent
+            save_path.mkdir(exist_ok=True, parents=True)
+            manifest = JobManifest.for_output(save_path, filename)
+            manifest.start(self.job_params(border_cut_line=border_cut_line,
+                                           border_cut_line_height=border_cut_line_height,
+                                           overlap_marks=overlap_marks,
+                                           registration_marks=registration_marks,
+                                           page_labels=page_labels,
+                                           output_profile=output_profile and str(output_profile),
+                                           rendering_intent=rendering_intent),
+                           plan_as_json(plan))
+
+        page_paths = {}
+        pending = []
+        for page_num in pages:
+            if save_path:
+                page_paths[page_num] = save_path / filename.format(page_num)
+                if resume and manifest.is_done(page_num, page_paths[page_num]):
+                    continue
+            pending.append(page_num)
+
+        mark_options = dict(border_cut_line=border_cut_line,
+                            border_cut_line_height=border_cut_line_height,
+                            overlap_marks=overlap_marks,
+                            registration_marks=registration_marks,
+                            page_labels=page_labels)
+        color_transform = self.color_transform(output_profile, rendering_intent) if output_profile else None
+        icc_profile = color_transform.output_profile if color_transform else None
+        if strategy is None and band_rows:
+            strategy = STRATEGY_BAND
+        render_plan = plan_render(plan, self.image.size, self.image.mode, budget=memory_budget, pages=pending,
+                                  can_band=bool(save_path), band_rows=band_rows or DEFAULT_BAND_ROWS)
+        if strategy is None:
+            strategy, band_rows = render_plan['strategy'], render_plan['band_rows']
+            peak = render_plan['peak']
+        else:
+            peak = estimate_memory(plan, self.image.size, self.image.mode, strategy, band_rows or DEFAULT_BAND_ROWS)
+        if pending and peak > render_plan['budget']:
+            message = (f'Estimated memory {peak / 2**20:.0f} MB exceeds budget '
+                       f'{render_plan["budget"] / 2**20:.0f} MB ({strategy} rendering)')
+            if memory_budget:
+                raise MemoryError(message)
+            print('Warning:', message)
+        if strategy == STRATEGY_BAND:
+            band_rows = band_rows or DEFAULT_BAND_ROWS
         else:
-            filename = None
-        save_path.mkdir(exist_ok=True, parents=True)
-
-        pages = []
-        for page_num, tile in enumerate(tiles['rects']):
-            rect = tile['rect']
-            page_pos = tile['page_pos']
-            cropped_img = resized.crop((mm_to_px(rect.x, dpi),
-                                       mm_to_px(rect.y, dpi),
-                                       mm_to_px(rect.x2, dpi),
-                                       mm_to_px(rect.y2, dpi)))
-            new_image = Image.new('RGB', (mm_to_px(page_size[0], dpi),
-                                          mm_to_px(page_size[1], dpi)),
-                                  color=(255, 255, 255))
-            new_image.paste(cropped_img, (mm_to_px(padding[0]+page_pos[0], dpi),
-                                          mm_to_px(padding[1]+page_pos[1], dpi)))
-            if border_cut_line:
-                self.add_border_cut_lines(
-                    new_image, mm_to_px(border_cut_line_height, dpi),
-                    tuple(map(lambda x: mm_to_px(x, dpi), padding)))
+            band_rows = None
+        rendered = {}
+        if band_rows:
+            if not save_path:
+                raise ValueError('Band rendering needs save_path')
+            for page_num in pending:
+                with open(page_paths[page_num], 'wb') as stream:
+                    self.stream_page(plan, page_num, stream, band_rows=band_rows,
+                                     color_transform=color_transform, **mark_options)
+                manifest.mark_done(page_num, page_paths[page_num])
+        for page_num, cropped_img in ([] if band_rows else self.iter_page_regions(
+                plan, pending, full_resize=strategy == STRATEGY_FULL)):
+            page_px_size, content_box, printable_box = self.page_geometry(plan, page_num)
+            new_image = Image.new('RGB', page_px_size, color=(255, 255, 255))
+            if color_transform:
+                cropped_img = color_transform.apply(cropped_img)
+            new_image.paste(cropped_img, content_box[:2])
+            self.page_marks(plan, page_num, **mark_options).apply(new_image)
+            if page_labels:
+                apply_label(new_image, self.page_label(plan, page_num), printable_box, mm_to_px(3, plan['dpi']))
             if save_path:
-                img_save_path = save_path / filename.format(page_num)
-                new_image.save(img_save_path.as_posix(), 'PNG')
-                new_image = img_save_path.as_posix()
-            pages.append(dict(
-                image=new_image,
+                new_image.save(page_paths[page_num].as_posix(), 'PNG', dpi=(plan['dpi'], plan['dpi']),
+                               icc_profile=icc_profile)
+                manifest.mark_done(page_num, page_paths[page_num])
+                new_image = page_paths[page_num].as_posix()
+            rendered[page_num] = new_image
+        if manifest:
+            manifest.close()
+
+        result_pages = []
+        for page_num in pages:
+            rect = plan['rects'][page_num]['rect']
+            result_pages.append(dict(
+                image=rendered[page_num] if page_num in rendered else page_paths[page_num].as_posix(),
                 page=page_num,
                 size=rect.size,
                 coords_pixels=rect.as_pixels(),
                 coords_mm=(rect.x, rect.y, rect.w, rect.h),
             ))
+        return dict(
+            rows=plan['rows'],
+            columns=plan['columns'],
+            pages=result_pages
+        )
 
+    def page_geometry(self, plan: dict, page_num: int) -> tuple:
+        """
+        Page layout in pixels
+
+        :return: page size, image content box, page box without padding
+        """
+        dpi = plan['dpi']
+        page_size = plan['page_size']
+        padding = plan['padding']
+        page_pos = plan['rects'][page_num]['page_pos']
+        box = rect_px_box(plan['rects'][page_num]['rect'], dpi)
+        content_pos = (mm_to_px(padding[0]+page_pos[0], dpi),
+                       mm_to_px(padding[1]+page_pos[1], dpi))
+        page_px_size = (mm_to_px(page_size[0], dpi), mm_to_px(page_size[1], dpi))
+        return (
+            page_px_size,
+            content_pos + (content_pos[0] + box[2] - box[0], content_pos[1] + box[3] - box[1]),
+            (mm_to_px(padding[0], dpi),
+             mm_to_px(padding[1], dpi),
+             page_px_size[0] - mm_to_px(padding[2], dpi),
+             page_px_size[1] - mm_to_px(padding[3], dpi)),
+        )
+
+    def page_marks(self, plan: dict, page_num: int,
+                   border_cut_line: bool = True,
+                   border_cut_line_height: int = 10,
+                   overlap_marks: bool = True,
+                   registration_marks: bool = False,
+                   **kwargs) -> MarkOverlay:
+        """
+        Cached marks overlay of page geometry
+        """
+        dpi = plan['dpi']
+        page_px_size, content_box, printable_box = self.page_geometry(plan, page_num)
+        return get_mark_overlay(
+            page_px_size,
+            content_box,
+            printable_box,
+            width=max(1, mm_to_px(0.2, dpi)),
+            cut_line_height=mm_to_px(border_cut_line_height, dpi) if border_cut_line else None,
+            registration_size=mm_to_px(5, dpi) if registration_marks else None,
+            overlap=mm_to_px(plan['overlap'], dpi) if overlap_marks else 0,
+            neighbours=page_neighbours(plan, page_num),
+        )
+
+    @staticmethod
+    def page_label(plan: dict, page_num: int) -> str:
+        x_step, y_step = plan['rects'][page_num]['grid_pos']
+        return f'#{page_num}  r{y_step}c{x_step}'
+
+    def stream_page(self, plan: dict, page_num: int, stream, band_rows: int = DEFAULT_BAND_ROWS,
+                    page_labels: bool = False, color_transform: ColorTransform = None, **mark_options):
+        """
+        Render page in horizontal bands and write it to PNG stream band by band.
+        Memory does not depend on page length: only one band of page and of resampled source exists at a time.
+
+        :param plan: layout from plan_tiles
+        :param page_num: page index
+        :param stream: binary file-like object, e.g. file or print_manager.PrintStream
+        :param band_rows: band height (pixels)
+        :param page_labels: add page number, row and column label
+        :param color_transform: applied to each band of image, see color_transform
+        :param mark_options: page_marks options
+        """
+        dpi = plan['dpi']
+        full_px_size = (mm_to_px(plan['image_size'][0], dpi), mm_to_px(plan['image_size'][1], dpi))
+        src_box = rect_px_box(plan['rects'][page_num]['rect'], dpi)
+        page_px_size, content_box, printable_box = self.page_geometry(plan, page_num)
+        overlay = self.page_marks(plan, page_num, **mark_options)
+        writer = PngStreamWriter(stream, page_px_size, dpi=dpi,
+                                 icc_profile=color_transform.output_profile if color_transform else None)
+        for top in range(0, page_px_size[1], band_rows):
+            bottom = min(top + band_rows, page_px_size[1])
+            band = Image.new('RGB', (page_px_size[0], bottom - top), color=(255, 255, 255))
+            content_top, content_bottom = max(top, content_box[1]), min(bottom, content_box[3])
+            if content_top < content_bottom:
+                strip = self.resample_region((src_box[0],
+                                              src_box[1] + content_top - content_box[1],
+                                              src_box[2],
+                                              src_box[1] + content_bottom - content_box[1]),
+                                             full_px_size)
+                if color_transform:
+                    strip = color_transform.apply(strip)
+                band.paste(strip, (content_box[0], content_top - top))
+            if overlay.shapes:
+                band.paste((0, 0, 0), (0, 0), overlay.mask(top, bottom))
+            if page_labels:
+                apply_label(band, self.page_label(plan, page_num), printable_box, mm_to_px(3, dpi),
+                            page_height=page_px_size[1], top=top)
+            writer.write_band(band)
+        writer.close()
+
+    def iter_page_regions(self, plan: dict, pages: list, full_resize: bool = None):
+        """
+        Yield page index and resampled image region of each page.
+
+        Full resize resamples whole image once. Otherwise only rows of selected pages are resampled:
+        pages of one row are cropped from one row band, and overlap strip between rows
+        is taken from previous band instead of resampling it again.
+
+        :param plan: layout from plan_tiles
+        :param pages: page indexes
+        :param full_resize: resize whole image, by default only if all pages are rendered
+        """
+        dpi = plan['dpi']
+        full_px_size = (mm_to_px(plan['image_size'][0], dpi), mm_to_px(plan['image_size'][1], dpi))
+        boxes = {page_num: rect_px_box(plan['rects'][page_num]['rect'], dpi) for page_num in pages}
+        if full_resize is None:
+            full_resize = len(boxes) == len(plan['rects'])
+        if boxes and full_resize:
+            # resize image to full size in mm using dpi
+            resized = self.image.resize(full_px_size)
+            for page_num in pages:
+                yield page_num, resized.crop(boxes[page_num])
+            return
+        rows = {}
+        for page_num in pages:
+            rows.setdefault(plan['rects'][page_num]['grid_pos'][1], []).append(page_num)
+        band = band_box = None
+        for row in sorted(rows):
+            row_boxes = [boxes[page_num] for page_num in rows[row]]
+            box = (min(b[0] for b in row_boxes), min(b[1] for b in row_boxes),
+                   max(b[2] for b in row_boxes), max(b[3] for b in row_boxes))
+            if band_box and band_box[0] == box[0] and band_box[2] == box[2] and band_box[1] < box[1] < band_box[3]:
+                # reuse overlap strip of previous row, resample only the rest
+                band = band.crop((0, box[1]-band_box[1], band.width, box[3]-band_box[1]))
+                if box[3] > band_box[3]:
+                    band.paste(self.resample_region((box[0], band_box[3], box[2], box[3]), full_px_size),
+                               (0, band_box[3]-box[1]))
+            else:
+                band = self.resample_region(box, full_px_size)
+            band_box = box
+            for page_num in rows[row]:
+                b = boxes[page_num]
+                yield page_num, band.crop((b[0]-box[0], b[1]-box[1], b[2]-box[0], b[3]-box[1]))
+
+    def resample_region(self, px_box: tuple, full_px_size: tuple) -> Image.Image:
+        """
+        Resample only part of source image, same pixels as crop of full resized image
+
+        :param px_box: region in resized image pixels: left, top, right, bottom
+        :param full_px_size: size of full resized image (pixels)
+        """
+        scale_x = self.image.width / full_px_size[0]
+        scale_y = self.image.height / full_px_size[1]
+        return self.image.resize((px_box[2]-px_box[0], px_box[3]-px_box[1]),
+                                 box=(px_box[0]*scale_x, px_box[1]*scale_y,
+                                      px_box[2]*scale_x, px_box[3]*scale_y))
+
+    def color_transform(self, output_profile: str = SRGB, rendering_intent: str = 'perceptual') -> ColorTransform:
+        """
+        Cached transform from embedded profile of source image (sRGB if none) to output profile
+        """
+        return get_color_transform(self.image.info.get('icc_profile'), str(output_profile), rendering_intent)
+
+    def job_params(self, **kwargs) -> dict:
+        """
+        Source image identity and render options for job manifest
+        """
+        stat = self.path.stat()
         return dict(
-            rows=tiles['rows'],
-            columns=tiles['columns'],
-            pages=pages
+            source=self.path.resolve().as_posix(),
+            source_size=stat.st_size,
+            source_mtime=stat.st_mtime_ns,
+            source_dpi=self.dpi,
+            **kwargs
         )
 
     @staticmethod
     def orient_page(page_size, orient):
+        if page_size[1] is None:
+            # roll media width is fixed
+            return tuple(page_size)
         page_orient = ORIENT_PORTRAIT if page_size[0] < page_size[1] else ORIENT_LANDSCAPE
         if orient == page_orient:
             return page_size
         else:
             return tuple(reversed(page_size))
 
-    def add_border_cut_lines(self, img, height, padding, width=0.2):
-        color = (0, 0, 0)
-        width = mm_to_px(width, self.dpi)
-        draw = ImageDraw.Draw(img)
-        p1 = (padding[0], padding[1])
-        p2 = (img.width - padding[2], padding[1])
-        p3 = (img.width - padding[2], img.height - padding[3])
-        p4 = (padding[0], img.height - padding[3])
-
-        if height:
-            draw.line((p1, (p1[0]+height, p1[1])), fill=color, width=width)
-            draw.line((p1, (p1[0], p1[1]+height)), fill=color, width=width)
-            draw.line((p2, (p2[0]-height, p2[1])), fill=color, width=width)
-            draw.line((p2, (p2[0], p2[1]+height)), fill=color, width=width)
-            draw.line((p3, (p3[0]-height, p3[1])), fill=color, width=width)
-            draw.line((p3, (p3[0], p3[1]-height)), fill=color, width=width)
-            draw.line((p4, (p4[0]+height, p4[1])), fill=color, width=width)
-            draw.line((p4, (p4[0], p4[1]-height)), fill=color, width=width)
-        else:
-            draw.line((p1, p2), fill=color, width=width)
-            draw.line((p2, p3), fill=color, width=width)
-            draw.line((p3, p4), fill=color, width=width)
-            draw.line((p4, p1), fill=color, width=width)
-        del draw
-
 
 @dataclass
 class Rect:
@@ -204,24 +529,34 @@ class Rect:
         h = min(self.y + self.h, bounding_box.y + bounding_box.h) - y
         return Rect(x, y, w, h)
 
-    def tile_rects_in_area(self, rect: 'Rect', offset: tuple = (0, 0), crop: bool = True):
+    def tile_rects_in_area(self, rect: 'Rect', offset: tuple = (0, 0), crop: bool = True, overlap: float = 0):
         """
         Function make grid on rectangles rect in other big area
         :param crop:
         :param rect: tuple(float, float)
         :param offset: tuple(float, float)
+        :param overlap: neighbour rects overlap size
         :return: list(Rect,)
         """
+        if not 0 <= overlap < min(rect.w, rect.h):
+            raise ValueError(f'Overlap must be less than tile size: {overlap}')
+        step_x, step_y = rect.w - overlap, rect.h - overlap
         rects = []
         columns = rows = 0
-        for y_step in range(int(self.h // rect.h) + 2):
-            for x_step in range(int(self.w//rect.w)+2):
-                next_rect = Rect((rect.w*x_step)-offset[0], (rect.h*y_step)-offset[1], rect.w, rect.h)
+        for y_step in range(int(self.h // step_y) + 2):
+            for x_step in range(int(self.w // step_x) + 2):
+                next_rect = Rect((step_x*x_step)-offset[0], (step_y*y_step)-offset[1], rect.w, rect.h)
+                # skip tile with only content already printed in overlap of previous one
+                if x_step and next_rect.x + overlap >= self.x + self.w:
+                    continue
+                if y_step and next_rect.y + overlap >= self.y + self.h:
+                    continue
                 if self.is_intersected(next_rect):
                     rows = max(y_step + 1, rows)
                     columns = max(x_step + 1, columns)
                     rects.append(dict(
                         rect=next_rect if not crop else next_rect.crop(self),
+                        grid_pos=(x_step, y_step),
                         page_pos=(
                             # offset[0] if (y_step == 0 and x_step == 0) else 0,
                             offset[0] if x_step == 0 else 0,
@@ -236,6 +571,84 @@ class Rect:
         }
 
 
+def plan_as_json(plan: dict) -> dict:
+    """
+    Layout plan with Rect objects replaced by tuples
+    """
+    return dict(plan, rects=[
+        dict(tile, rect=(tile['rect'].x, tile['rect'].y, tile['rect'].w, tile['rect'].h))
+        for tile in plan['rects']
+    ])
+
+
+def rect_px_box(rect: Rect, dpi: int) -> tuple:
+    """
+    Rect edges in pixels: left, top, right, bottom
+    """
+    return (mm_to_px(rect.x, dpi),
+            mm_to_px(rect.y, dpi),
+            mm_to_px(rect.x2, dpi),
+            mm_to_px(rect.y2, dpi))
+
+
+def page_neighbours(plan: dict, page_num: int) -> tuple:
+    """
+    Page has neighbour page: left, top, right, bottom
+    """
+    grid = {tile['grid_pos'] for tile in plan['rects']}
+    x, y = plan['rects'][page_num]['grid_pos']
+    return (x-1, y) in grid, (x, y-1) in grid, (x+1, y) in grid, (x, y+1) in grid
+
+
+def select_pages(plan: dict, spec) -> list:
+    """
+    Page indexes of layout plan by selection spec.
+    Pages, rows and columns are zero based, same as numbers in saved file names.
+
+        3       page 3
+        2-5     pages 2, 3, 4, 5
+        r1      all pages of row 1
+        c2      all pages of column 2
+        r1c2    page on row 1, column 2
+
+    :param plan: layout from Tiler.plan_tiles
+    :param spec: int, str or list of them. Items of string can be separated by comma
+    :return: sorted list of unique indexes
+    """
+    import re
+    if isinstance(spec, (int, str)):
+        spec = [spec]
+    items = []
+    for item in spec:
+        items.extend(str(item).replace(',', ' ').split())
+    page_count = len(plan['rects'])
+    selected = set()
+    for item in items:
+        item = item.strip().lower()
+        if re.fullmatch(r'\d+', item):
+            selected.add(int(item))
+        elif re.fullmatch(r'\d+-\d+', item):
+            first, last = map(int, item.split('-'))
+            if first > last:
+                raise ValueError(f'Wrong page range: {item}, first page is after the last one')
+            selected.update(range(first, last + 1))
+        else:
+            match = re.fullmatch(r'(?:r(\d+))?(?:c(\d+))?', item)
+            if not match or not item:
+                raise ValueError(f'Wrong page selection: {item}')
+            row, column = match.groups()
+            matched = [page_num for page_num, tile in enumerate(plan['rects'])
+                       if (row is None or int(row) == tile['grid_pos'][1])
+                       and (column is None or int(column) == tile['grid_pos'][0])]
+            if not matched:
+                raise ValueError(f'No pages match {item}: {plan["rows"]} rows, {plan["columns"]} columns')
+            selected.update(matched)
+    wrong = [num for num in selected if num >= page_count]
+    if wrong:
+        raise ValueError(f'Page out of range: {wrong}, pages count is {page_count}')
+    return sorted(selected)
+
+
 def px_to_mm(pixels: int, dpi: int):
     return pixels * 25.4 / dpi
 
@@ -9,6 +9,7 @@ class CanvasScene(QGraphicsScene):
     gridSize = 50, 50
     image_item = None
     padding = (0, 0, 0, 0)
+    overlap = 0
     pos_under_cursor = None
     imageChanged = Signal()
 
@@ -53,19 +54,28 @@ class CanvasScene(QGraphicsScene):
 
     def draw_pages(self, **kwargs):
         grid_size = kwargs.get('paper_size')
-        self.gridSize = Tiler.orient_page(grid_size, kwargs['orientation'])
+        # preview grid is in whole millimeters, custom media sizes can be fractional
+        self.gridSize = tuple(int(round(x)) for x in Tiler.orient_page(grid_size, kwargs['orientation']))
         self.padding = kwargs['padding']
+        self.overlap = min(kwargs.get('overlap', 0), min(self.gridSize) - 1)
         self.update()
 
     def get_paper_rects(self, image_rect, grid_size):
-        x_count = int((image_rect.width()+image_rect.x()) // grid_size[0])+1
-        y_count = int((image_rect.height()+image_rect.y()) // grid_size[1])+1
+        # neighbour pages overlap, so grid step is smaller than page
+        step = grid_size[0] - self.overlap, grid_size[1] - self.overlap
+        x_count = int((image_rect.width()+image_rect.x()) // step[0])+1
+        y_count = int((image_rect.height()+image_rect.y()) // step[1])+1
         paper_rects = []
         for x in range(x_count):
             for y in range(y_count):
-                paper_rect = QRect(x*grid_size[0], y*grid_size[1], *grid_size)
+                paper_rect = QRect(x*step[0], y*step[1], *grid_size)
                 if not paper_rect.intersects(image_rect):
                     continue
+                # page with only content already printed in overlap of previous one
+                if x and paper_rect.x() + self.overlap >= image_rect.x() + image_rect.width():
+                    continue
+                if y and paper_rect.y() + self.overlap >= image_rect.y() + image_rect.height():
+                    continue
                 paper_rects.append(paper_rect)
         return paper_rects
 
@@ -73,12 +83,12 @@ class CanvasScene(QGraphicsScene):
         self.gridSize = paper_size
         self.padding = padding
 
-    def set_image(self, image_path):
+    def set_image(self, image_path, pixmap=None):
         if self.image_item:
             self.removeItem(self.image_item)
             self.image_item = None
         if image_path:
-            self.image_item = ImageItem(str(image_path), callback=self.imageChanged.emit)
+            self.image_item = ImageItem(pixmap or str(image_path), callback=self.imageChanged.emit)
             self.addItem(self.image_item)
             # QObject.connect(self.image_item.geometryChanged, self.imageChanged.emit)
             # self.image_item.geometryChanged.connect(self.imageChanged.emit)
@@ -13,7 +13,7 @@ class ImageItem(QGraphicsItem):
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges, True)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsFocusable, True)
         self.callback = callback
-        self.pix = QPixmap(image)
+        self.pix = image if isinstance(image, QPixmap) else QPixmap(image)
         self.draw_handle = False
         self._is_resized = False
         self._orig_pos_point = None
@@ -105,6 +105,19 @@ class ImageItem(QGraphicsItem):
         self.update()
         return super().mouseReleaseEvent(mouseEvent)
 
+    def set_pixmap(self, pix: QPixmap):
+        """
+        Replace displayed image, keep current geometry (e.g. preview to full resolution image)
+        """
+        self.pix = pix
+        self.update()
+
+    def set_geometry(self, x, y, w, h):
+        self.prepareGeometryChange()
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self._aspect_ratio = w / h
+        self.update()
+
     def set_scale(self, factor):
         self.w = int(self.w * factor)
         self.h = int(self.h * factor)